@@ -0,0 +1,491 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Tuple, List, Dict, Any, Iterable, AsyncIterator, Callable
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.exceptions import NotFoundError
+from elasticsearch.helpers import async_bulk
+
+from elastic_helpers import ESConnector, ESBulkIndexer, ESQueryMaker
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AsyncESConnector(ESConnector):
+
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None,
+                 connections_per_node: int = 10, client_options: Optional[dict[str, Any]] = None,
+                 **connection_options: Any):
+        """
+        Initialize the AsyncESConnector.
+
+        Same as ESConnector, but backed by an AsyncElasticsearch client, so every call is awaitable
+        and many requests can share one event loop. The client comes from the ESClientRegistry
+        unless `shared_client=False`; shared async clients should only be used from one event loop.
+
+        Args:
+            cloud_id (str): The Cloud ID of the Elasticsearch cluster.
+            credentials (Optional[Tuple[str, str]]): A tuple containing the username and password for authentication.
+            connections_per_node (int): The size of the connection pool to each node. Default is 10.
+            client_options (Optional[dict[str, Any]]): Other client settings; see ESConnector.
+            **connection_options: `request_timeout` and `shared_client`; see ESConnector.
+        """
+        client_options = {"connections_per_node": connections_per_node, **(client_options or {})}
+        super().__init__(cloud_id, credentials, client_options=client_options, **connection_options)
+
+    def create_es_connection(self) -> AsyncElasticsearch:
+        """
+        Create an async connection to the Elasticsearch cluster.
+
+        Returns:
+            AsyncElasticsearch: An AsyncElasticsearch client instance.
+        """
+        return super().create_es_connection(client_class=AsyncElasticsearch)
+
+    async def close(self) -> None:
+        """
+        Close a private client. Shared clients stay open for the other helpers; close them with ESClientRegistry.aclose_all().
+        """
+        if not self.shared_client:
+            await self.conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def ping(self) -> None:
+        if await self.conn.ping():
+            print("Ping successful: Connected to Elasticsearch!")
+        else:
+            print("Ping unsuccessful: Elasticsearch is not available!")
+
+    async def print_indices(self) -> None:
+        indices = await self.conn.indices.get_alias(index="*")
+        for index in indices:
+            print(index)
+
+    async def get_cluster_health(self, printOnly=False) -> dict[str, Any]:
+        try:
+            health = await self.conn.cluster.health()
+            logger.info(f"Cluster health retrieved successfully: \n\n {str(health)}")
+            if not printOnly:
+                return health
+        except Exception as e:
+            logger.error(f"An error occurred while retrieving cluster health: {e}")
+            return {}
+
+    async def get_index_settings(self, index_name: str) -> dict[str, Any]:
+        try:
+            settings = await self.conn.indices.get_settings(index=index_name)
+            logger.info(f"Settings for index {index_name} retrieved successfully.")
+            return settings
+        except NotFoundError:
+            logger.warning(f"Index {index_name} not found.")
+            return {}
+        except Exception as e:
+            logger.error(f"An error occurred while retrieving settings for index {index_name}: {e}")
+            return {}
+
+    async def update_index_settings(self, index_name: str, new_settings: dict[str, Any]) -> None:
+        try:
+            await self.conn.indices.put_settings(index=index_name, settings=new_settings)
+            logger.info(f"Settings for index {index_name} updated successfully.")
+        except NotFoundError:
+            logger.warning(f"Index {index_name} not found.")
+        except Exception as e:
+            logger.error(f"An error occurred while updating settings for index {index_name}: {e}")
+
+    async def check_index_existence(self, index_name) -> bool:
+        return bool(await self.conn.indices.exists(index=index_name))
+
+    async def create_es_index(self, es_configuration: dict, index_name: str, override=True) -> None:
+        try:
+            if override:
+                await self.delete_es_index(index_name=index_name)
+
+            await self.conn.indices.create(
+                index=index_name,
+                settings=es_configuration.get("settings", {}),
+                mappings=es_configuration.get("mappings", {})
+            )
+            self._mark_index_written(index_name)
+            logger.info(f"New index {index_name} created!")
+        except Exception as e:
+            logger.error(f"An error occurred while creating the index {index_name}: {e}")
+
+    async def delete_es_index(self, index_name: str) -> None:
+        try:
+            if await self.conn.indices.exists(index=index_name):
+                logger.info(f"The index {index_name} already exists, going to remove it")
+                await self.conn.indices.delete(index=index_name)
+                self._mark_index_written(index_name)
+                logger.info(f"Index {index_name} deleted successfully.")
+            else:
+                logger.info(f"Index {index_name} does not exist.")
+        except NotFoundError:
+            logger.warning(f"Index {index_name} not found. Nothing to delete.")
+        except Exception as e:
+            logger.error(f"An error occurred: {e}")
+
+
+class AsyncESBulkIndexer(AsyncESConnector, ESBulkIndexer):
+
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None,
+                 connections_per_node: int = 10, **connection_options: Any):
+        super().__init__(cloud_id, credentials, connections_per_node, **connection_options)
+
+    async def add_document(self, index_name: str, document: dict[str, Any], doc_id: Optional[str] = None) -> None:
+        try:
+            if doc_id:
+                await self.conn.index(index=index_name, id=doc_id, document=document)
+            else:
+                await self.conn.index(index=index_name, document=document)
+            self._mark_index_written(index_name)
+            logger.info(f"Document added to {index_name}")
+        except Exception as e:
+            logger.error(f"An error occurred while adding the document to {index_name}: {e}")
+
+    async def delete_document(self, index_name: str, doc_id: str) -> None:
+        try:
+            await self.conn.delete(index=index_name, id=doc_id)
+            self._mark_index_written(index_name)
+            logger.info(f"Document with ID {doc_id} deleted from {index_name}")
+        except NotFoundError:
+            logger.warning(f"Document with ID {doc_id} not found in index {index_name}.")
+        except Exception as e:
+            logger.error(f"An error occurred while deleting the document from {index_name}: {e}")
+
+    async def get_document(self, index_name: str, doc_id: str) -> Optional[dict[str, Any]]:
+        try:
+            response = await self.conn.get(index=index_name, id=doc_id)
+            logger.info(f"Document with ID {doc_id} retrieved from {index_name}")
+            return response["_source"]
+        except NotFoundError:
+            logger.warning(f"Document with ID {doc_id} not found in index {index_name}.")
+            return None
+        except Exception as e:
+            logger.error(f"An error occurred while retrieving the document from {index_name}: {e}")
+            return None
+
+    async def update_document(self, index_name: str, doc_id: str, updated_fields: dict[str, Any]) -> None:
+        try:
+            await self.conn.update(index=index_name, id=doc_id, doc=updated_fields)
+            self._mark_index_written(index_name)
+            logger.info(f"Document with ID {doc_id} updated in {index_name}")
+        except NotFoundError:
+            logger.warning(f"Document with ID {doc_id} not found in index {index_name}.")
+        except Exception as e:
+            logger.error(f"An error occurred while updating the document in {index_name}: {e}")
+
+    async def _upload_batch(self, index_name: str, batch_number: int, actions: list[dict[str, Any]], batch_bytes: int) -> dict[str, Any]:
+        """
+        Send one batch of actions in a single bulk request and report its outcome.
+        """
+        stats = {
+            "batch": batch_number,
+            "documents": len(actions),
+            "bytes": batch_bytes,
+            "success": 0,
+            "failed": 0,
+            "retried": 0,
+            "seconds": 0.0,
+            "error": None
+        }
+        start = time.perf_counter()
+        try:
+            success, failed = await async_bulk(self.conn, actions, chunk_size=len(actions), raise_on_error=False)
+            stats["success"] = success
+            stats["failed"] = len(failed)
+            logger.info(f"Batch {batch_number}: Successfully indexed {success} documents to {index_name}")
+            if failed:
+                logger.warning(f"Batch {batch_number}: Failed to index {len(failed)} documents")
+        except Exception as e:
+            stats["failed"] = len(actions)
+            stats["error"] = str(e)
+            logger.error(f"An error occurred while uploading batch {batch_number} to {index_name}: {e}")
+        self._mark_index_written(index_name)
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    async def stream_bulk_upload_documents(self, index_name: str, documents: Iterable[dict[str, Any]], id_col: str,
+                                           batch_size: int = 1000, max_batch_bytes: int = 10 * 1024 * 1024,
+                                           max_concurrency: int = 4,
+                                           on_batch_done: Optional[Callable[[dict[str, Any], list[str]], None]] = None) -> dict[str, Any]:
+        """
+        Bulk upload a stream of documents, with up to `max_concurrency` bulk requests in flight on the event loop.
+
+        Args:
+            index_name (str): The name of the index.
+            documents (Iterable[dict[str, Any]]): The documents to upload.
+            id_col (str): The name of the column to use as the document ID.
+            batch_size (int): The maximum number of documents per bulk request. Default is 1000.
+            max_batch_bytes (int): The approximate maximum payload size per bulk request. Default is 10MB.
+            max_concurrency (int): The number of bulk requests in flight at once. Default is 4.
+            on_batch_done (Optional[Callable]): See ESBulkIndexer.stream_bulk_upload_documents.
+
+        Returns:
+            dict: Totals (`total_success`, `total_failed`, `total_batches`) and per-batch stats under `batches`.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        actions = (self._build_upsert_action(index_name, document, id_col) for document in documents)
+        tasks = []
+
+        async def upload(batch_number, batch, batch_bytes, offset):
+            batch_ids = [action["_id"] for action in batch]
+            batch_stats = await self._upload_batch(index_name, batch_number, batch, batch_bytes)
+            batch_stats["offset"] = offset
+            if on_batch_done is not None:
+                on_batch_done(batch_stats, batch_ids)
+            return batch_stats
+
+        start = time.perf_counter()
+        offset = 0
+        for batch_number, (batch, batch_bytes) in enumerate(self._iter_action_batches(actions, lambda: batch_size, max_batch_bytes), start=1):
+            # Wait for a free slot before building the next batch, so memory stays bounded
+            await semaphore.acquire()
+            task = asyncio.create_task(upload(batch_number, batch, batch_bytes, offset))
+            task.add_done_callback(lambda _: semaphore.release())
+            tasks.append(task)
+            offset += len(batch)
+        batches = await asyncio.gather(*tasks)
+
+        results = {
+            "total_success": sum(batch_stats["success"] for batch_stats in batches),
+            "total_failed": sum(batch_stats["failed"] for batch_stats in batches),
+            "total_batches": len(batches),
+            "batches": list(batches)
+        }
+        elapsed = time.perf_counter() - start
+        logger.info(f"Total documents successfully indexed to {index_name}: {results['total_success']} "
+                    f"in {results['total_batches']} batches ({elapsed:.1f}s)")
+        if results["total_failed"]:
+            logger.warning(f"Total documents failed to index: {results['total_failed']}")
+        return results
+
+    async def bulk_upload_documents(self, index_name: str, documents: Iterable[dict[str, Any]], id_col: str,
+                                    batch_size: int = 1000, max_concurrency: int = 4) -> int:
+        """
+        Bulk upload documents to an Elasticsearch index with batching.
+
+        Returns:
+            int: The total number of successfully indexed documents.
+        """
+        results = await self.stream_bulk_upload_documents(index_name, documents, id_col, batch_size=batch_size,
+                                                          max_concurrency=max_concurrency)
+        return results["total_success"]
+
+    async def bulk_delete_documents(self, index_name: str, document_ids: list[str]) -> int:
+        actions = [
+            {
+                "_op_type": "delete",
+                "_index": index_name,
+                "_id": doc_id
+            }
+            for doc_id in document_ids
+        ]
+
+        try:
+            success, failed = await async_bulk(self.conn, actions, raise_on_error=False)
+            self._mark_index_written(index_name)
+            logger.info(f"Successfully deleted {success} documents from {index_name}")
+            if failed:
+                logger.warning(f"Failed to delete {len(failed)} documents")
+            return success
+        except Exception as e:
+            logger.error(f"An error occurred while bulk deleting documents from {index_name}: {e}")
+            return 0
+
+    async def bulk_reindex(self, source_index: str, target_index: str) -> dict:
+        try:
+            response = await self.conn.reindex(source={"index": source_index}, dest={"index": target_index},
+                                               wait_for_completion=True)
+            self._mark_index_written(target_index)
+            logger.info(f"Successfully reindexed documents from {source_index} to {target_index}")
+            return response
+        except Exception as e:
+            logger.error(f"An error occurred while reindexing documents: {e}")
+            return {}
+
+    async def get_index_meta(self, index_name: str) -> dict[str, Any]:
+        try:
+            mapping = await self.conn.indices.get_mapping(index=index_name)
+            return dict(next(iter(mapping.values())).get("mappings", {}).get("_meta", {})) if mapping else {}
+        except Exception as e:
+            logger.error(f"An error occurred while retrieving the _meta of index {index_name}: {e}")
+            return {}
+
+    async def put_index_meta(self, index_name: str, meta: dict[str, Any]) -> None:
+        try:
+            await self.conn.indices.put_mapping(index=index_name, meta=meta)
+        except Exception as e:
+            logger.error(f"An error occurred while updating the _meta of index {index_name}: {e}")
+
+    @asynccontextmanager
+    async def bulk_load(self, index_name: str, force_merge: bool = False, max_num_segments: int = 1,
+                        merge_timeout: float = 3600.0) -> AsyncIterator["AsyncESBulkIndexer"]:
+        """
+        Async ESBulkIndexer.bulk_load; use it with `async with`.
+        """
+        meta = await self.get_index_meta(index_name)
+        original_settings, save = self._bulk_load_originals(index_name, await self.get_index_settings(index_name), meta)
+        if original_settings is None:
+            logger.warning(f"Index {index_name} has no settings to restore; loading without the bulk-load profile")
+            yield self
+            return
+
+        if save:
+            await self.put_index_meta(index_name, {**meta, self.BULK_LOAD_META_KEY: original_settings})
+        await self.update_index_settings(index_name, {"index": self.BULK_LOAD_SETTINGS})
+        logger.info(f"Index {index_name} switched to the bulk-load profile: {self.BULK_LOAD_SETTINGS}")
+        succeeded = False
+        try:
+            yield self
+            succeeded = True
+        finally:
+            await self.update_index_settings(index_name, {"index": original_settings})
+            await self.put_index_meta(index_name, {key: value for key, value in meta.items()
+                                                   if key != self.BULK_LOAD_META_KEY})
+            try:
+                await self.conn.indices.refresh(index=index_name)
+                if succeeded and force_merge:
+                    await self.conn.options(request_timeout=merge_timeout).indices.forcemerge(
+                        index=index_name, max_num_segments=max_num_segments)
+                    logger.info(f"Index {index_name} force-merged to {max_num_segments} segments")
+            except Exception as e:
+                logger.error(f"An error occurred while finishing the bulk load of {index_name}: {e}")
+            self._mark_index_written(index_name)
+            logger.info(f"Index {index_name} settings restored after bulk load: {original_settings}")
+
+
+class AsyncESQueryMaker(AsyncESConnector, ESQueryMaker):
+
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None,
+                 connections_per_node: int = 10, **connection_options: Any):
+        super().__init__(cloud_id, credentials, connections_per_node, **connection_options)
+
+    async def search_index(self, index_name: str, query: str, fields: List[str],
+                           source_fields: Optional[List[str]] = None, retrieve_fields: Optional[List[Any]] = None,
+                           docvalue_fields: Optional[List[Any]] = None) -> Dict:
+        try:
+            search_body = {
+                "query": {
+                    "multi_match": {
+                        "query": query,
+                        "fields": fields
+                    }
+                },
+                **self._response_shape(source_fields, retrieve_fields, docvalue_fields)
+            }
+            response, generation = self._get_cached(index_name, search_body)
+            if response is not None:
+                return response
+            response = await self.conn.search(index=index_name, body=search_body)
+            self._put_cached(index_name, search_body, response, generation)
+            logger.info(f"Search executed on index: {index_name} with query: {query}")
+            return response
+        except Exception as e:
+            logger.error(f"Error executing search on index: {index_name} with query: {query}. Error: {e}")
+            raise e
+
+    async def hybrid_vector_search(self, index_name: str, query_text: str, query_vector: List[float],
+                                   text_field: str, vector_field: str,
+                                   num_candidates: int = 100, num_results: int = 10,
+                                   fusion: Optional[str] = None, weights: Tuple[float, float] = (1.0, 1.0),
+                                   rank_constant: int = 60, rank_window_size: int = 50,
+                                   source_fields: Optional[List[str]] = None,
+                                   retrieve_fields: Optional[List[Any]] = None,
+                                   docvalue_fields: Optional[List[Any]] = None) -> Tuple[Dict, Dict]:
+        """
+        Awaitable ESQueryMaker.hybrid_vector_search.
+        """
+        if fusion is not None:
+            return await self.fused_hybrid_search(index_name, query_text, query_vector, text_field, vector_field,
+                                                  num_candidates=num_candidates, num_results=num_results,
+                                                  fusion=fusion, weights=weights, rank_constant=rank_constant,
+                                                  rank_window_size=rank_window_size, source_fields=source_fields,
+                                                  retrieve_fields=retrieve_fields, docvalue_fields=docvalue_fields)
+        try:
+            shape = self._response_shape(source_fields, retrieve_fields, docvalue_fields, exclude_fields=[vector_field])
+            search_body = self._hybrid_search_body(query_text, query_vector, text_field, vector_field, num_candidates,
+                                                   shape)
+            cache_key = {**search_body, "size": num_results}
+            response, generation = self._get_cached(index_name, cache_key)
+            if response is not None:
+                return response, search_body
+            response = await self.conn.search(index=index_name, body=search_body, size=num_results)
+            self._put_cached(index_name, cache_key, response, generation)
+            logger.info(f"Hybrid search executed on index: {index_name} with text query: {query_text}")
+            return response, search_body
+        except Exception as e:
+            logger.error(f"Error executing hybrid search on index: {index_name}. Error: {e}")
+            raise e
+
+    async def fused_hybrid_search(self, index_name: str, query_text: str, query_vector: List[float],
+                                  text_field: str, vector_field: str,
+                                  num_candidates: int = 100, num_results: int = 10, fusion: str = "rrf",
+                                  weights: Tuple[float, float] = (1.0, 1.0), rank_constant: int = 60,
+                                  rank_window_size: int = 50, source_fields: Optional[List[str]] = None,
+                                  retrieve_fields: Optional[List[Any]] = None,
+                                  docvalue_fields: Optional[List[Any]] = None) -> Tuple[Dict, Dict]:
+        """
+        Awaitable ESQueryMaker.fused_hybrid_search.
+        """
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}. Expected 'rrf' or 'weighted'")
+        shape = self._response_shape(source_fields, retrieve_fields, docvalue_fields, exclude_fields=[vector_field])
+        search_body = self._fused_search_bodies(query_text, query_vector, text_field, vector_field,
+                                                num_candidates, max(num_results, rank_window_size), shape)
+        cache_key = {"searches": search_body, "fusion": fusion, "weights": list(weights),
+                     "rank_constant": rank_constant, "size": num_results}
+        try:
+            response, generation = self._get_cached(index_name, cache_key)
+            if response is not None:
+                return response, search_body
+            start = time.perf_counter()
+            responses = await self.msearch(index_name, list(search_body.values()))
+            response = self._fuse_responses(index_name, dict(zip(search_body, responses)), fusion, weights,
+                                            rank_constant, num_results)
+            response["took"] = int((time.perf_counter() - start) * 1000)
+            self._put_cached(index_name, cache_key, response, generation)
+            logger.info(f"Fused ({fusion}) hybrid search executed on index: {index_name} with text query: {query_text}")
+            return response, search_body
+        except Exception as e:
+            logger.error(f"Error executing fused hybrid search on index: {index_name}. Error: {e}")
+            raise e
+
+    async def msearch(self, index_name: str, search_bodies: List[Dict]) -> List[Dict]:
+        """
+        Awaitable ESQueryMaker.msearch.
+        """
+        if not search_bodies:
+            return []
+        searches = []
+        for body in search_bodies:
+            searches.extend([{"index": index_name}, body])
+        try:
+            responses = (await self.conn.msearch(searches=searches))["responses"]
+            logger.info(f"Multi-search of {len(search_bodies)} searches executed on index: {index_name}")
+            return responses
+        except Exception as e:
+            logger.error(f"Error executing multi-search on index: {index_name}. Error: {e}")
+            raise e
+
+    async def batch_search(self, index_name: str, queries: List[Tuple[str, Optional[List[float]]]], text_field: str,
+                           vector_field: Optional[str] = None, num_candidates: int = 100, num_results: int = 10,
+                           fusion: Optional[str] = None, weights: Tuple[float, float] = (1.0, 1.0),
+                           rank_constant: int = 60, rank_window_size: int = 50,
+                           source_fields: Optional[List[str]] = None, retrieve_fields: Optional[List[Any]] = None,
+                           docvalue_fields: Optional[List[Any]] = None) -> List[Dict]:
+        """
+        Awaitable ESQueryMaker.batch_search.
+        """
+        shape = self._response_shape(source_fields, retrieve_fields, docvalue_fields,
+                                     exclude_fields=[vector_field] if vector_field else [])
+        groups = self._batch_search_groups(queries, text_field, vector_field, num_candidates, num_results,
+                                           fusion, rank_window_size, shape)
+        responses = await self.msearch(index_name, [body for group in groups for body in group.values()])
+        return self._split_batch_responses(index_name, groups, responses, fusion, weights, rank_constant, num_results)
@@ -1,11 +1,67 @@
 import uuid
 import re
+from collections import deque
+from typing import NamedTuple, Any, Optional
+
+# Namespace for deterministic, content-derived chunk IDs
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2d4e-8a3b-5c7d-9e0f-1a2b3c4d5e6f")
+
+
+class ChunkSpan(NamedTuple):
+    '''
+    A chunk as a character span over its parent's text.
+    The parent document is shared by reference, so neither the text nor the metadata is copied.
+    '''
+    id_: str
+    parent_id: str
+    chunk_index: int
+    char_start: int
+    char_end: int
+    word_count: int
+    parent: dict[str, Any]
+    token_count: Optional[int] = None
+    embedding: Optional[Any] = None
+
+    @property
+    def text(self) -> str:
+        return self.parent['text'][self.char_start:self.char_end]
+
+    def to_document(self, text_field='chunk') -> dict[str, Any]:
+        '''
+        Materialize the chunk as a document dict, in the same shape as word_wise_chunk_documents.
+        '''
+        chunk_doc = {
+            'id_': self.id_,
+            text_field: self.text,
+            'chunk_index': self.chunk_index,
+            'parent_id': self.parent_id,
+            'chunk_word_count': self.word_count,
+            'char_start': self.char_start,
+            'char_end': self.char_end
+        }
+        if self.token_count is not None:
+            chunk_doc['chunk_token_count'] = self.token_count
+        if self.embedding is not None:
+            chunk_doc['embedding'] = self.embedding.tolist()
+        for key, value in self.parent.items():
+            if key != 'text' and key not in chunk_doc:
+                chunk_doc[key] = value
+        return chunk_doc
 
 
 class Chunker: 
     def __init__(self):
         pass 
 
+    @staticmethod
+    def chunk_id(parent_id, offset, chunk_text):
+        '''
+        Deterministic chunk ID derived from the parent, the chunk's character offset within it
+        and its original text slice. Re-chunking an unchanged document yields the same IDs, whichever
+        chunking API is used, so upserts dedupe instead of duplicating.
+        '''
+        return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{parent_id}\0{offset}\0{chunk_text}"))
+
     def word_wise_chunk_documents(self, documents, chunk_size=256, overlap=32):
         ''' 
         Chunk the text of each document, with overlaps for improved clarity. 
@@ -15,17 +71,19 @@ class Chunker:
         chunked_documents = []
 
         for doc in documents:
-            # Split the text into words
-            words = re.findall(r'\S+', doc['text'])
+            # Split the text into words, keeping their positions for the chunk IDs
+            matches = list(re.finditer(r'\S+', doc['text']))
+            words = [match.group() for match in matches]
             
             # Create chunks
             for i in range(0, len(words), chunk_size - overlap):
                 chunk_words = words[i:i + chunk_size]
                 chunk_text = ' '.join(chunk_words)
+                char_start, char_end = matches[i].start(), matches[i + len(chunk_words) - 1].end()
 
                 # Create a new document object for this chunk
                 chunk_doc = {
-                    'id_': str(uuid.uuid4()),  # Generate a new unique ID
+                    'id_': self.chunk_id(doc['id_'], char_start, doc['text'][char_start:char_end]),  # Same ID as iter_chunk_spans
                     'chunk': chunk_text,  # Add the new 'chunk' field
                     'chunk_index': len(chunked_documents),  # Add an index for this chunk
                     'parent_id': doc['id_'],  # Add a reference to the parent document
@@ -39,4 +97,270 @@ class Chunker:
 
                 chunked_documents.append(chunk_doc)
 
-        return chunked_documents
\ No newline at end of file
+        return chunked_documents
+
+    def iter_word_spans(self, text, chunk_size=256, overlap=32):
+        '''
+        Lazily yield (char_start, char_end, word_count) for overlapping word windows over text.
+        Only the word boundaries of the current window are held in memory.
+        A trailing window is skipped if all of its words were already covered by the previous one.
+        '''
+        step = chunk_size - overlap
+        if step <= 0:
+            raise ValueError("overlap must be smaller than chunk_size")
+        window = deque()
+        unseen = 0  # Words in the window not covered by any emitted chunk yet
+        for match in re.finditer(r'\S+', text):
+            window.append((match.start(), match.end()))
+            unseen += 1
+            if len(window) == chunk_size:
+                yield window[0][0], window[-1][1], len(window)
+                unseen = 0
+                for _ in range(step):
+                    window.popleft()
+        if window and unseen:
+            yield window[0][0], window[-1][1], len(window)
+
+    def iter_chunk_spans(self, documents, chunk_size=256, overlap=32):
+        '''
+        Streaming version of word_wise_chunk_documents.
+        Takes any iterable of documents and yields ChunkSpan objects one at a time,
+        so memory stays constant no matter how large the corpus is.
+        Use ChunkSpan.to_document() to build the dict for embedding and indexing.
+        '''
+        chunk_index = 0
+        for doc in documents:
+            text = doc['text']
+            for char_start, char_end, word_count in self.iter_word_spans(text, chunk_size, overlap):
+                yield ChunkSpan(
+                    id_=self.chunk_id(doc['id_'], char_start, text[char_start:char_end]),
+                    parent_id=doc['id_'],
+                    chunk_index=chunk_index,
+                    char_start=char_start,
+                    char_end=char_end,
+                    word_count=word_count,
+                    parent=doc
+                )
+                chunk_index += 1
+
+    def stream_chunk_documents(self, documents, chunk_size=256, overlap=32):
+        '''
+        Lazily yield chunk document dicts, ready for the streaming bulk indexer.
+        '''
+        for span in self.iter_chunk_spans(documents, chunk_size, overlap):
+            yield span.to_document()
+
+    @staticmethod
+    def _token_budget(tokenizer, max_tokens, max_length):
+        '''
+        Tokens available per chunk: the window the embedder actually embeds (the smaller of the tokenizer's
+        model_max_length and the embedder's max_length) minus the special tokens the tokenizer adds.
+        A larger max_tokens is capped to it, since anything beyond it would be truncated when embedded.
+        '''
+        # Tokenizers without a configured limit report a huge sentinel value, which min() discards
+        window = min(tokenizer.model_max_length, max_length) - tokenizer.num_special_tokens_to_add()
+        return window if max_tokens is None else min(max_tokens, window)
+
+    @staticmethod
+    def _token_windows(offsets, max_tokens, overlap):
+        '''
+        Yield (char_start, char_end, token_count) for overlapping windows over a list of token offsets.
+        '''
+        step = max_tokens - overlap
+        if step <= 0:
+            raise ValueError("overlap must be smaller than max_tokens")
+        for i in range(0, len(offsets), step):
+            window = offsets[i:i + max_tokens]
+            yield window[0][0], window[-1][1], len(window)
+            if i + max_tokens >= len(offsets):
+                break
+
+    @staticmethod
+    def _batched(documents, batch_size):
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def token_chunk_documents(self, documents, tokenizer, max_tokens=None, overlap=32, batch_size=64, max_length=512):
+        '''
+        Chunk documents into windows of exactly max_tokens tokens of the embedding model's own (fast) tokenizer,
+        so every chunk fills the model window and nothing is truncated when it is embedded.
+        max_tokens defaults to the model window minus special tokens; pass the EmbeddingModel's max_length
+        if it embeds more or fewer than 512 tokens.
+        Documents are tokenized batch_size at a time; ChunkSpan objects are yielded lazily.
+        '''
+        max_tokens = self._token_budget(tokenizer, max_tokens, max_length)
+        chunk_index = 0
+        for batch in self._batched(documents, batch_size):
+            encodings = tokenizer([doc['text'] for doc in batch], add_special_tokens=False, return_offsets_mapping=True)
+            for doc, offsets in zip(batch, encodings['offset_mapping']):
+                text = doc['text']
+                for char_start, char_end, token_count in self._token_windows(offsets, max_tokens, overlap):
+                    chunk_text = text[char_start:char_end]
+                    yield ChunkSpan(
+                        id_=self.chunk_id(doc['id_'], char_start, chunk_text),
+                        parent_id=doc['id_'],
+                        chunk_index=chunk_index,
+                        char_start=char_start,
+                        char_end=char_end,
+                        word_count=len(chunk_text.split()),
+                        parent=doc,
+                        token_count=token_count
+                    )
+                    chunk_index += 1
+
+    def _sentence_spans(self, text, split_into_sentences):
+        '''
+        Split text into sentences and locate each one in the original text as (char_start, char_end).
+        '''
+        spans = []
+        cursor = 0
+        for sentence in split_into_sentences(text):
+            start = text.find(sentence, cursor)
+            if start == -1:
+                start = cursor
+            end = start + len(sentence)
+            spans.append((start, end))
+            cursor = end
+        return spans
+
+    def sentence_chunk_documents(self, documents, tokenizer, nltk_processor=None, max_tokens=None, batch_size=64,
+                                 max_length=512):
+        '''
+        Pack whole sentences (from NLTKProcessor.split_into_sentences) into chunks of up to max_tokens tokens
+        of the embedding model's tokenizer. A sentence longer than the budget is split into token windows.
+        max_tokens is capped as in token_chunk_documents, with max_length the EmbeddingModel's max_length.
+        All sentences of batch_size documents are tokenized in one call; ChunkSpan objects are yielded lazily.
+        '''
+        if nltk_processor is None:
+            from nltk_processor import NLTKProcessor
+            nltk_processor = NLTKProcessor()
+        max_tokens = self._token_budget(tokenizer, max_tokens, max_length)
+        chunk_index = 0
+
+        for batch in self._batched(documents, batch_size):
+            doc_spans = [self._sentence_spans(doc['text'], nltk_processor.split_into_sentences) for doc in batch]
+            sentences = [doc['text'][start:end] for doc, spans in zip(batch, doc_spans) for start, end in spans]
+            encodings = tokenizer(sentences, add_special_tokens=False, return_offsets_mapping=True) if sentences else {'offset_mapping': []}
+            sentence_offsets = iter(encodings['offset_mapping'])
+
+            for doc, spans in zip(batch, doc_spans):
+                # Pieces are (char_start, char_end, token_count), each at most max_tokens long
+                pieces = []
+                for (start, end), offsets in zip(spans, sentence_offsets):
+                    if len(offsets) <= max_tokens:
+                        pieces.append((start, end, len(offsets)))
+                    else:
+                        pieces.extend((start + piece_start, start + piece_end, token_count)
+                                      for piece_start, piece_end, token_count in self._token_windows(offsets, max_tokens, 0))
+
+                chunks = []
+                chunk_start, chunk_end, chunk_tokens = None, None, 0
+                for start, end, token_count in pieces:
+                    if chunk_start is not None and chunk_tokens + token_count > max_tokens:
+                        chunks.append((chunk_start, chunk_end, chunk_tokens))
+                        chunk_start, chunk_tokens = None, 0
+                    if chunk_start is None:
+                        chunk_start = start
+                    chunk_end = end
+                    chunk_tokens += token_count
+                if chunk_start is not None:
+                    chunks.append((chunk_start, chunk_end, chunk_tokens))
+
+                text = doc['text']
+                for char_start, char_end, token_count in chunks:
+                    chunk_text = text[char_start:char_end]
+                    yield ChunkSpan(
+                        id_=self.chunk_id(doc['id_'], char_start, chunk_text),
+                        parent_id=doc['id_'],
+                        chunk_index=chunk_index,
+                        char_start=char_start,
+                        char_end=char_end,
+                        word_count=len(chunk_text.split()),
+                        parent=doc,
+                        token_count=token_count
+                    )
+                    chunk_index += 1
+
+    def semantic_chunk_documents(self, documents, embedder, nltk_processor=None, max_tokens=None,
+                                 breakpoint_percentile=10, similarity_threshold=None, batch_size=64):
+        '''
+        Chunk documents where the topic shifts.
+        All sentences of batch_size documents are embedded in one bucketed pass through the EmbeddingModel,
+        then the cosine similarity of each sentence to the next is computed in one vectorized step.
+        A chunk ends where that similarity drops below the document's breakpoint_percentile
+        (or below similarity_threshold, if given), or when the next sentence would exceed max_tokens.
+        Each ChunkSpan carries the mean of its sentence embeddings, so to_document() already
+        includes the 'embedding' field and the chunks do not need to be embedded again.
+        '''
+        import numpy as np
+
+        if nltk_processor is None:
+            from nltk_processor import NLTKProcessor
+            nltk_processor = NLTKProcessor()
+        max_tokens = self._token_budget(embedder.tokenizer, max_tokens, embedder.max_length)
+        chunk_index = 0
+
+        for batch in self._batched(documents, batch_size):
+            doc_spans = [self._sentence_spans(doc['text'], nltk_processor.split_into_sentences) for doc in batch]
+            sentences = [doc['text'][start:end] for doc, spans in zip(batch, doc_spans) for start, end in spans]
+            if not sentences:
+                continue
+            embeddings = embedder.encode_bucketed(sentences, show_progress=False)
+            token_counts = [len(ids) for ids in embedder.tokenizer(sentences, add_special_tokens=False)['input_ids']]
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            unit = embeddings / np.maximum(norms, 1e-12)
+
+            offset = 0
+            for doc, spans in zip(batch, doc_spans):
+                n = len(spans)
+                if n == 0:
+                    continue
+                doc_embeddings = embeddings[offset:offset + n]
+                doc_unit = unit[offset:offset + n]
+                doc_tokens = token_counts[offset:offset + n]
+                offset += n
+
+                # similarities[i] is between sentence i and sentence i + 1
+                similarities = np.sum(doc_unit[:-1] * doc_unit[1:], axis=1)
+                if similarity_threshold is not None:
+                    threshold = similarity_threshold
+                else:
+                    threshold = np.percentile(similarities, breakpoint_percentile) if len(similarities) else 0.0
+                breaks = similarities < threshold
+
+                starts = [0]
+                chunk_tokens = doc_tokens[0]
+                for i in range(1, n):
+                    if breaks[i - 1] or chunk_tokens + doc_tokens[i] > max_tokens:
+                        starts.append(i)
+                        chunk_tokens = 0
+                    chunk_tokens += doc_tokens[i]
+                ends = starts[1:] + [n]
+
+                counts = np.diff(starts + [n])[:, None]
+                chunk_embeddings = np.add.reduceat(doc_embeddings, starts, axis=0) / counts
+                if embedder.normalize:
+                    chunk_embeddings /= np.maximum(np.linalg.norm(chunk_embeddings, axis=1, keepdims=True), 1e-12)
+
+                text = doc['text']
+                for start, end, chunk_embedding in zip(starts, ends, chunk_embeddings.astype(np.float32)):
+                    char_start, char_end = spans[start][0], spans[end - 1][1]
+                    chunk_text = text[char_start:char_end]
+                    yield ChunkSpan(
+                        id_=self.chunk_id(doc['id_'], char_start, chunk_text),
+                        parent_id=doc['id_'],
+                        chunk_index=chunk_index,
+                        char_start=char_start,
+                        char_end=char_end,
+                        word_count=len(chunk_text.split()),
+                        parent=doc,
+                        token_count=sum(doc_tokens[start:end]),
+                        embedding=chunk_embedding
+                    )
+                    chunk_index += 1
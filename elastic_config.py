@@ -1,3 +1,6 @@
+import copy
+import math
+
 BASIC_CONFIG = {
     "settings": {
         "number_of_shards": 1,
@@ -7,4 +10,91 @@ BASIC_CONFIG = {
     "mappings": {
         "dynamic": True
     }
-}
\ No newline at end of file
+}
+
+def exclude_from_source(config, fields=("embedding",)):
+    """
+    Return a copy of an index config whose stored _source leaves out `fields`.
+
+    The fields are still indexed, so a dense_vector stays searchable with kNN, but the vectors
+    are no longer kept in _source: hits cannot return them and the index is smaller on disk.
+    Partial updates and reindexing rebuild documents from _source, so they drop these fields.
+    """
+    config = copy.deepcopy(config)
+    source = config.setdefault("mappings", {}).setdefault("_source", {})
+    source["excludes"] = list(dict.fromkeys([*source.get("excludes", []), *fields]))
+    return config
+
+
+VECTOR_INDEX_TYPES = ("hnsw", "int8_hnsw", "int4_hnsw", "bbq_hnsw", "flat", "int8_flat", "int4_flat", "bbq_flat")
+
+# Bytes per dimension kept in memory for HNSW search, by index type (raw float32 vectors stay on disk)
+_BYTES_PER_DIMENSION = {"hnsw": 4, "flat": 4, "int8_hnsw": 1, "int8_flat": 1,
+                        "int4_hnsw": 0.5, "int4_flat": 0.5, "bbq_hnsw": 0.125, "bbq_flat": 0.125}
+
+def build_vector_index_config(dims, similarity="cosine", index_type="int8_hnsw", m=16, ef_construction=100,
+                              text_field="chunk", vector_field="embedding", expected_documents=None,
+                              max_shard_size_gb=30, number_of_shards=None, number_of_replicas=0,
+                              exclude_vectors=False):
+    """
+    Build an index config with an explicit mapping for chunk documents, instead of relying on dynamic mapping.
+
+    dims is the embedding size (EmbeddingModel.dimension). The vector field is mapped as an indexed
+    dense_vector with the given similarity and index_type: int8_hnsw keeps a quarter of the float32
+    memory, int4_hnsw an eighth and bbq_hnsw (dims >= 64) a thirty-second, while the raw vectors stay on
+    disk for rescoring. Use "dot_product" similarity with a normalizing EmbeddingModel.
+    The text field is mapped as text, the chunk IDs and offsets as keyword/integer fields, and any
+    other string metadata (file name, page label, ...) as keyword rather than text + keyword.
+    Without number_of_shards, the shard count is sized from expected_documents so that no shard
+    holds more than about max_shard_size_gb of vectors and text; one shard when it is unknown.
+    With exclude_vectors, vectors are left out of the stored _source (see exclude_from_source).
+    """
+    if index_type not in VECTOR_INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}. Expected one of {VECTOR_INDEX_TYPES}")
+    if index_type.startswith("bbq") and dims < 64:
+        raise ValueError(f"{index_type} needs at least 64 dimensions, got {dims}")
+    if index_type.startswith("int4") and dims % 2:
+        raise ValueError(f"{index_type} needs an even number of dimensions, got {dims}")
+
+    index_options = {"type": index_type}
+    if index_type.endswith("hnsw"):
+        index_options.update({"m": m, "ef_construction": ef_construction})
+
+    if number_of_shards is None:
+        number_of_shards = 1
+        if expected_documents:
+            # float32 vector on disk + quantized copy + roughly 2KB of text and metadata per chunk
+            bytes_per_document = dims * (4 + _BYTES_PER_DIMENSION[index_type]) + 2048
+            number_of_shards = max(1, math.ceil(expected_documents * bytes_per_document / (max_shard_size_gb * 1024 ** 3)))
+
+    config = {
+        "settings": {
+            "number_of_shards": number_of_shards,
+            "number_of_replicas": number_of_replicas,
+            "max_result_window": 10000
+        },
+        "mappings": {
+            "dynamic": True,
+            "dynamic_templates": [
+                {"strings_as_keywords": {"match_mapping_type": "string", "mapping": {"type": "keyword", "ignore_above": 1024}}}
+            ],
+            "properties": {
+                "id_": {"type": "keyword"},
+                "parent_id": {"type": "keyword"},
+                text_field: {"type": "text"},
+                "chunk_index": {"type": "integer"},
+                "chunk_word_count": {"type": "integer"},
+                "chunk_token_count": {"type": "integer"},
+                "char_start": {"type": "integer"},
+                "char_end": {"type": "integer"},
+                vector_field: {
+                    "type": "dense_vector",
+                    "dims": dims,
+                    "index": True,
+                    "similarity": similarity,
+                    "index_options": index_options
+                }
+            }
+        }
+    }
+    return exclude_from_source(config, [vector_field]) if exclude_vectors else config
@@ -1,7 +1,14 @@
+import hashlib
 import logging
-from typing import Optional, Tuple, List, Dict, Any
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from typing import Optional, Tuple, List, Dict, Any, Iterable, Iterator, Callable
 from elasticsearch import Elasticsearch
-from elasticsearch.exceptions import NotFoundError
+from elasticsearch.exceptions import NotFoundError, ApiError, TransportError
 from elasticsearch.helpers import bulk
 import json
 import re 
@@ -10,36 +17,254 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class ESClientRegistry:
+    """
+    Process-wide registry of Elasticsearch clients.
+
+    Clients are keyed by client class, cluster, credentials and client options, so every helper
+    pointed at the same cluster shares one client, one connection pool and one set of TLS sessions.
+    """
+
+    _clients: dict[tuple, Any] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _key(cls, client_class: type, cloud_id: str, credentials: Optional[Tuple[str, str]],
+             client_options: dict[str, Any]) -> tuple:
+        username, password = credentials if credentials else (None, None)
+        password_hash = hashlib.sha256(password.encode("utf-8")).hexdigest() if password else None
+        # Serialized rather than hashed directly, so unhashable option values (e.g. headers={...}) work
+        options = json.dumps(client_options, sort_keys=True, default=repr)
+        return (client_class.__name__, cloud_id, username, password_hash, options)
+
+    @classmethod
+    def get_client(cls, cloud_id: str, credentials: Optional[Tuple[str, str]] = None,
+                   client_class: type = Elasticsearch, **client_options: Any) -> Any:
+        """
+        Get the shared client for a cluster, creating it on first use.
+
+        Args:
+            cloud_id (str): The Cloud ID of the Elasticsearch cluster.
+            credentials (Optional[Tuple[str, str]]): A tuple containing the username and password for authentication.
+            client_class (type): Elasticsearch or AsyncElasticsearch.
+            **client_options: Client settings, e.g. `connections_per_node` (pool size per node),
+                `http_compress` (gzip request bodies), `request_timeout`, `max_retries` and `retry_on_timeout`.
+
+        Returns:
+            The shared client instance.
+        """
+        key = cls._key(client_class, cloud_id, credentials, client_options)
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None:
+                if credentials:
+                    client_options = {**client_options, "basic_auth": (credentials[0], credentials[1])}
+                client = client_class(cloud_id=cloud_id, **client_options)
+                cls._clients[key] = client
+                logger.info(f"Connection created for cloud_id: {cloud_id}")
+            else:
+                logger.info(f"Reusing shared connection for cloud_id: {cloud_id}")
+        return client
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Close every shared synchronous client. Async clients must be closed with `aclose_all`.
+        """
+        with cls._lock:
+            for key, client in list(cls._clients.items()):
+                if isinstance(client, Elasticsearch):
+                    client.close()
+                    del cls._clients[key]
+
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """
+        Close every shared async client.
+        """
+        with cls._lock:
+            clients = [(key, client) for key, client in cls._clients.items() if not isinstance(client, Elasticsearch)]
+            for key, _ in clients:
+                del cls._clients[key]
+        for _, client in clients:
+            await client.close()
+
+
+class IndexGenerations:
+    """
+    Process-wide write counters, one per (cluster, index).
+
+    Every helper that writes to an index bumps its generation, so cached search results
+    recorded under an older generation are known to be stale.
+
+    A write only becomes visible to searches at the next refresh, so a search sent just after
+    a write can still return the old hits and cache them under the new generation. To drop those,
+    each written index is bumped again `refresh_grace` seconds after its last write (one timer per
+    index, however many writes land meanwhile). Raise it for indices with a longer refresh_interval.
+    """
+
+    refresh_grace: float = 1.5
+    _generations: dict[Tuple[str, str], int] = {}
+    _settle_due: dict[Tuple[str, str], float] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, cloud_id: str, index_name: str) -> int:
+        return cls._generations.get((cloud_id, index_name), 0)
+
+    @classmethod
+    def bump(cls, cloud_id: str, index_name: str) -> None:
+        key = (cloud_id, index_name)
+        with cls._lock:
+            cls._generations[key] = cls._generations.get(key, 0) + 1
+            if cls.refresh_grace <= 0:
+                return
+            timer_running = key in cls._settle_due
+            cls._settle_due[key] = time.monotonic() + cls.refresh_grace
+        if not timer_running:
+            cls._start_settle_timer(key, cls.refresh_grace)
+
+    @classmethod
+    def _start_settle_timer(cls, key: Tuple[str, str], delay: float) -> None:
+        timer = threading.Timer(delay, cls._settle, args=(key,))
+        timer.daemon = True
+        timer.start()
+
+    @classmethod
+    def _settle(cls, key: Tuple[str, str]) -> None:
+        """
+        Bump once the last write has had time to be refreshed, or wait longer if more writes came in.
+        """
+        with cls._lock:
+            remaining = cls._settle_due[key] - time.monotonic()
+            if remaining <= 0:
+                del cls._settle_due[key]
+                cls._generations[key] = cls._generations.get(key, 0) + 1
+        if remaining > 0:
+            cls._start_settle_timer(key, remaining)
+
+
+class QueryResultCache:
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        """
+        Initialize the QueryResultCache.
+
+        An LRU cache of search responses keyed by cluster, index and the normalized search body.
+        Entries expire after `ttl` seconds and are dropped as soon as the index is written to
+        through any helper in this process, and again once that write has been refreshed (see IndexGenerations). Writes made by other processes
+        are only picked up once the TTL runs out. Cached responses are shared, so treat them as read-only.
+
+        Args:
+            max_entries (int): The maximum number of cached responses. Default is 1024.
+            ttl (float): How long a response stays valid, in seconds. Default is 300.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(cloud_id: str, index_name: str, search_body: Any) -> str:
+        normalized = json.dumps(search_body, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(f"{cloud_id}\0{index_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, cloud_id: str, index_name: str, search_body: Any) -> Optional[Any]:
+        key = self.make_key(cloud_id, index_name, search_body)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, generation, response = entry
+                if expires_at > time.monotonic() and generation == IndexGenerations.get(cloud_id, index_name):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, cloud_id: str, index_name: str, search_body: Any, response: Any, generation: int) -> None:
+        """
+        Store a response. `generation` must be read before the search was sent, so a write
+        that lands while the search is in flight still invalidates it.
+        """
+        key = self.make_key(cloud_id, index_name, search_body)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, generation, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
 class ESConnector:
 
-    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None):
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None,
+                 client_options: Optional[dict[str, Any]] = None, request_timeout: Optional[float] = None,
+                 shared_client: bool = True):
         """
         Initialize the ESConnector.
 
         Args:
             es_url (str): The URL of the Elasticsearch cluster.
             credentials (Optional[Tuple[str, str]]): A tuple containing the username and password for authentication.
+            client_options (Optional[dict[str, Any]]): Client settings such as `connections_per_node`,
+                `http_compress`, `request_timeout` and `max_retries`. Helpers with the same cluster,
+                credentials and options share one client.
+            request_timeout (Optional[float]): A request timeout for this helper only. It applies to the
+                shared client's pool without creating a new one.
+            shared_client (bool): Whether to take the client from the ESClientRegistry. If False, a private client is created.
 
         """
         self.cloud_id=cloud_id
         self.credentials = credentials
+        self.client_options = client_options or {}
+        self.request_timeout = request_timeout
+        self.shared_client = shared_client
         self.conn = self.create_es_connection()
 
-    def create_es_connection(self) -> Elasticsearch:
+    def create_es_connection(self, client_class: type = Elasticsearch) -> Elasticsearch:
         """
         Create a connection to the Elasticsearch cluster.
 
         Returns:
             Elasticsearch: An Elasticsearch client instance.
         """
-        username,password=self.credentials[0],self.credentials[1]
-        es = Elasticsearch(
-            cloud_id=self.cloud_id,
-            basic_auth=(username, password)
-        )
-        logger.info(f"Connection created for cloud_id: {self.cloud_id}")
+        if self.shared_client:
+            es = ESClientRegistry.get_client(self.cloud_id, self.credentials, client_class, **self.client_options)
+        else:
+            username,password=self.credentials[0],self.credentials[1]
+            es = client_class(
+                cloud_id=self.cloud_id,
+                basic_auth=(username, password),
+                **self.client_options
+            )
+            logger.info(f"Connection created for cloud_id: {self.cloud_id}")
+        if self.request_timeout is not None:
+            # options() returns a view of the same client, so the connection pool is still shared
+            es = es.options(request_timeout=self.request_timeout)
         return es
 
+    def _mark_index_written(self, index_name: str) -> None:
+        """
+        Invalidate cached search results for an index after writing to it.
+        """
+        IndexGenerations.bump(self.cloud_id, index_name)
+
     def ping(self) -> None:
         if self.conn.ping():
             print("Ping successful: Connected to Elasticsearch!")
@@ -124,6 +349,7 @@ class ESConnector:
                 settings=es_configuration.get("settings", {}),
                 mappings=es_configuration.get("mappings", {})
             )
+            self._mark_index_written(index_name)
             logger.info(f"New index {index_name} created!")
         except Exception as e:
             logger.error(f"An error occurred while creating the index {index_name}: {e}")
@@ -139,6 +365,7 @@ class ESConnector:
             if self.conn.indices.exists(index=index_name):
                 logger.info(f"The index {index_name} already exists, going to remove it")
                 self.conn.indices.delete(index=index_name)
+                self._mark_index_written(index_name)
                 logger.info(f"Index {index_name} deleted successfully.")
             else:
                 logger.info(f"Index {index_name} does not exist.")
@@ -149,8 +376,8 @@ class ESConnector:
 
 class ESIndexer(ESConnector):
 
-    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None):
-        super().__init__(cloud_id, credentials)
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None, **connection_options: Any):
+        super().__init__(cloud_id, credentials, **connection_options)
 
     def add_document(self, index_name: str, document: dict[str, Any], doc_id: Optional[str] = None) -> None:
         """
@@ -167,6 +394,7 @@ class ESIndexer(ESConnector):
                 self.conn.index(index=index_name, id=doc_id, document=document)
             else:
                 self.conn.index(index=index_name, document=document)
+            self._mark_index_written(index_name)
             logger.info(f"Document added to {index_name}")
         except Exception as e:
             logger.error(f"An error occurred while adding the document to {index_name}: {e}")
@@ -181,6 +409,7 @@ class ESIndexer(ESConnector):
         """
         try:
             self.conn.delete(index=index_name, id=doc_id)
+            self._mark_index_written(index_name)
             logger.info(f"Document with ID {doc_id} deleted from {index_name}")
         except NotFoundError:
             logger.warning(f"Document with ID {doc_id} not found in index {index_name}.")
@@ -220,6 +449,7 @@ class ESIndexer(ESConnector):
         """
         try:
             self.conn.update(index=index_name, id=doc_id, doc=updated_fields)
+            self._mark_index_written(index_name)
             logger.info(f"Document with ID {doc_id} updated in {index_name}")
         except NotFoundError:
             logger.warning(f"Document with ID {doc_id} not found in index {index_name}.")
@@ -227,12 +457,227 @@ class ESIndexer(ESConnector):
             logger.error(f"An error occurred while updating the document in {index_name}: {e}")
 
 
+class AdaptiveBulkController:
+
+    RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+    def __init__(self, initial_batch_size: int = 1000, min_batch_size: int = 50, max_batch_size: int = 5000,
+                 target_latency: float = 2.0, growth_step: Optional[int] = None, max_retries: int = 5,
+                 initial_backoff: float = 1.0, max_backoff: float = 60.0, dead_letter_path: Optional[str] = None):
+        """
+        Initialize the AdaptiveBulkController.
+
+        Batch size follows additive-increase / multiplicative-decrease: it grows by `growth_step`
+        while bulk requests stay under `target_latency`, shrinks by a quarter when they are slower,
+        and halves on rejections (429) or timeouts.
+
+        Args:
+            initial_batch_size (int): The starting number of documents per bulk request.
+            min_batch_size (int): The smallest batch size the controller will shrink to.
+            max_batch_size (int): The largest batch size the controller will grow to.
+            target_latency (float): The bulk request latency, in seconds, to aim for.
+            growth_step (Optional[int]): How many documents to add per fast request. Defaults to 10% of the initial size.
+            max_retries (int): How many times a rejected item or batch is retried before it is dead-lettered.
+            initial_backoff (float): The backoff, in seconds, before the first retry. Doubles on every further retry.
+            max_backoff (float): The maximum backoff between retries, in seconds.
+            dead_letter_path (Optional[str]): A JSON lines file that permanently failed documents are appended to.
+        """
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_latency = target_latency
+        self.growth_step = growth_step or max(1, initial_batch_size // 10)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.dead_letter_path = dead_letter_path
+        self._batch_size = min(max(initial_batch_size, min_batch_size), max_batch_size)
+        self._lock = threading.Lock()
+
+    def get_batch_size(self) -> int:
+        with self._lock:
+            return self._batch_size
+
+    def _resize(self, new_size: float) -> None:
+        old_size = self._batch_size
+        self._batch_size = int(min(max(new_size, self.min_batch_size), self.max_batch_size))
+        if self._batch_size != old_size:
+            logger.info(f"Bulk batch size adjusted from {old_size} to {self._batch_size}")
+
+    def record_latency(self, seconds: float, rejected_items: int = 0) -> None:
+        """
+        Adapt the batch size to the outcome of one bulk request.
+
+        Args:
+            seconds (float): How long the bulk request took.
+            rejected_items (int): How many items in the request were rejected with a retryable status.
+        """
+        with self._lock:
+            if rejected_items:
+                self._resize(self._batch_size / 2)
+            elif seconds > self.target_latency:
+                self._resize(self._batch_size * 0.75)
+            else:
+                self._resize(self._batch_size + self.growth_step)
+
+    def record_rejection(self) -> None:
+        """
+        Halve the batch size after a whole bulk request was rejected or timed out.
+        """
+        with self._lock:
+            self._resize(self._batch_size / 2)
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """
+        Exponential backoff with jitter for the given retry attempt (starting at 1).
+        """
+        backoff = min(self.max_backoff, self.initial_backoff * (2 ** (attempt - 1)))
+        return backoff * random.uniform(0.5, 1.0)
+
+    def is_retryable_exception(self, error: Exception) -> bool:
+        if isinstance(error, ApiError):
+            return error.status_code in self.RETRYABLE_STATUSES
+        # Connection errors and timeouts
+        return isinstance(error, TransportError)
+
+    def write_dead_letters(self, actions: list[dict[str, Any]], errors: list[Any]) -> None:
+        """
+        Append permanently failed actions and their errors to the dead-letter file.
+
+        Args:
+            actions (list[dict[str, Any]]): The failed bulk actions.
+            errors (list[Any]): The error reported for each action.
+        """
+        if not actions:
+            return
+        if not self.dead_letter_path:
+            logger.warning(f"Dropping {len(actions)} permanently failed documents (no dead-letter file configured)")
+            return
+        with self._lock:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for action, error in zip(actions, errors):
+                    f.write(json.dumps({"action": action, "error": error}, default=str) + "\n")
+        logger.warning(f"Wrote {len(actions)} permanently failed documents to {self.dead_letter_path}")
+
+
 class ESBulkIndexer(ESIndexer):
 
-    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None):
-        super().__init__(cloud_id, credentials)
+    BULK_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+    BULK_LOAD_META_KEY = "bulk_load_original_settings"
+
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None, **connection_options: Any):
+        super().__init__(cloud_id, credentials, **connection_options)
+
+    @staticmethod
+    def _settings_to_restore(settings: dict[str, Any]) -> Optional[dict[str, Any]]:
+        """
+        Pick the settings a bulk load changes out of a get_index_settings response.
+        A refresh_interval that was never set is restored as None, which resets it to the cluster default.
+        """
+        if not settings:
+            return None
+        index_settings = next(iter(settings.values())).get("settings", {}).get("index", {})
+        return {name: index_settings.get(name) for name in ESBulkIndexer.BULK_LOAD_SETTINGS}
+
+    def _bulk_load_originals(self, index_name: str, settings: dict[str, Any],
+                             meta: dict[str, Any]) -> Tuple[Optional[dict[str, Any]], bool]:
+        """
+        Decide which settings a bulk load restores on exit.
+
+        The pre-load settings are kept in the index `_meta` for the duration of the load, so if a
+        previous load was killed, they are found there instead of reading the bulk-load profile it left
+        behind as the "original" settings. An index stuck with refresh disabled and nothing saved
+        (e.g. from before this was tracked) gets its refresh_interval reset to the cluster default.
+
+        Returns:
+            Tuple[Optional[dict[str, Any]], bool]: The settings to restore (None if the index has none),
+                and whether they still need to be saved to the index `_meta`.
+        """
+        saved = meta.get(self.BULK_LOAD_META_KEY)
+        if saved is not None:
+            logger.warning(f"Index {index_name} is still in the profile of an interrupted bulk load; "
+                           f"the settings saved before it will be restored: {saved}")
+            return saved, False
+        original_settings = self._settings_to_restore(settings)
+        if original_settings is not None and str(original_settings["refresh_interval"]) == "-1":
+            logger.warning(f"Index {index_name} has refresh disabled and no saved pre-load settings; "
+                           f"its refresh_interval will be reset to the cluster default")
+            original_settings["refresh_interval"] = None
+        return original_settings, original_settings is not None
+
+    def get_index_meta(self, index_name: str) -> dict[str, Any]:
+        """
+        Get the `_meta` of an index mapping, or an empty dict if it has none or cannot be read.
+        """
+        try:
+            mapping = self.conn.indices.get_mapping(index=index_name)
+            return dict(next(iter(mapping.values())).get("mappings", {}).get("_meta", {})) if mapping else {}
+        except Exception as e:
+            logger.error(f"An error occurred while retrieving the _meta of index {index_name}: {e}")
+            return {}
 
-    def bulk_upload_documents(self, index_name: str, documents: list[dict[str, Any]], id_col: str, batch_size: int = 1000) -> int:
+    def put_index_meta(self, index_name: str, meta: dict[str, Any]) -> None:
+        """
+        Replace the `_meta` of an index mapping.
+        """
+        try:
+            self.conn.indices.put_mapping(index=index_name, meta=meta)
+        except Exception as e:
+            logger.error(f"An error occurred while updating the _meta of index {index_name}: {e}")
+
+    @contextmanager
+    def bulk_load(self, index_name: str, force_merge: bool = False, max_num_segments: int = 1,
+                  merge_timeout: float = 3600.0) -> Iterator["ESBulkIndexer"]:
+        """
+        Run a bulk load with the index switched to a write-optimized profile.
+
+        On entry the index gets `refresh_interval: -1` and zero replicas, so segments are not
+        refreshed every second and every document is only written once. On exit, including when the
+        load raised, the original settings (read with get_index_settings) are put back and the index
+        is refreshed so the new documents become searchable. The original settings are also saved in
+        the index `_meta` until then, so if the process is killed mid-load, the next bulk_load on the
+        index restores them rather than the bulk-load profile.
+
+            with es_bulk_indexer.bulk_load(index_name, force_merge=True):
+                es_bulk_indexer.stream_bulk_upload_documents(index_name, documents, id_col="id_")
+
+        Args:
+            index_name (str): The name of the index to load. It must already exist.
+            force_merge (bool): Force-merge the index down to `max_num_segments` after a successful load.
+            max_num_segments (int): The segment count to force-merge to. Default is 1.
+            merge_timeout (float): Request timeout for the force-merge, in seconds. Default is 3600.
+        """
+        meta = self.get_index_meta(index_name)
+        original_settings, save = self._bulk_load_originals(index_name, self.get_index_settings(index_name), meta)
+        if original_settings is None:
+            logger.warning(f"Index {index_name} has no settings to restore; loading without the bulk-load profile")
+            yield self
+            return
+
+        if save:
+            self.put_index_meta(index_name, {**meta, self.BULK_LOAD_META_KEY: original_settings})
+        self.update_index_settings(index_name, {"index": self.BULK_LOAD_SETTINGS})
+        logger.info(f"Index {index_name} switched to the bulk-load profile: {self.BULK_LOAD_SETTINGS}")
+        succeeded = False
+        try:
+            yield self
+            succeeded = True
+        finally:
+            self.update_index_settings(index_name, {"index": original_settings})
+            self.put_index_meta(index_name, {key: value for key, value in meta.items() if key != self.BULK_LOAD_META_KEY})
+            try:
+                self.conn.indices.refresh(index=index_name)
+                if succeeded and force_merge:
+                    self.conn.options(request_timeout=merge_timeout).indices.forcemerge(
+                        index=index_name, max_num_segments=max_num_segments)
+                    logger.info(f"Index {index_name} force-merged to {max_num_segments} segments")
+            except Exception as e:
+                logger.error(f"An error occurred while finishing the bulk load of {index_name}: {e}")
+            # Documents only become visible at this refresh, so cached searches from during the load are stale
+            self._mark_index_written(index_name)
+            logger.info(f"Index {index_name} settings restored after bulk load: {original_settings}")
+
+    def bulk_upload_documents(self, index_name: str, documents: list[dict[str, Any]], id_col: str, batch_size: int = 1000,
+                              controller: Optional[AdaptiveBulkController] = None) -> int:
         """
         Bulk upload documents to an Elasticsearch index with batching.
 
@@ -241,10 +686,16 @@ class ESBulkIndexer(ESIndexer):
             documents (list[dict[str, Any]]): The list of documents to upload.
             id_col (str): The name of the column to use as the document ID.
             batch_size (int): The number of documents to upload in each batch. Default is 1000.
+            controller (Optional[AdaptiveBulkController]): If given, failed items are retried with backoff,
+                the batch size adapts to the cluster and permanent failures are dead-lettered.
 
         Returns:
             int: The total number of successfully indexed documents.
         """
+        if controller is not None:
+            results = self.stream_bulk_upload_documents(index_name, documents, id_col, num_workers=1, controller=controller)
+            return results["total_success"]
+
         total_success = 0
         total_failed = 0
 
@@ -271,12 +722,227 @@ class ESBulkIndexer(ESIndexer):
             except Exception as e:
                 logger.error(f"An error occurred while uploading batch {i//batch_size + 1} to {index_name}: {e}")
 
+        self._mark_index_written(index_name)
         logger.info(f"Total documents successfully indexed to {index_name}: {total_success}")
         if total_failed:
             logger.warning(f"Total documents failed to index: {total_failed}")
 
         return total_success
-        
+
+    def _build_upsert_action(self, index_name: str, document: dict[str, Any], id_col: str) -> dict[str, Any]:
+        return {
+            "_op_type": "update",
+            "_index": index_name,
+            "_id": document[id_col],
+            "doc": document,
+            "doc_as_upsert": True
+        }
+
+    @staticmethod
+    def _estimate_json_bytes(value: Any) -> int:
+        """
+        Cheap upper-end estimate of the serialized size of a value, without encoding it
+        (the client serializes every action anyway). Floats count as 20 bytes, the length of a
+        typical float64 repr, so embedding vectors are not underestimated; NumPy arrays are sized
+        from their element count.
+        """
+        if isinstance(value, str):
+            return len(value) + 2
+        if isinstance(value, float):
+            return 20
+        if isinstance(value, (bool, int)) or value is None:
+            return len(str(value))
+        if isinstance(value, dict):
+            return 2 + sum(len(str(key)) + 4 + ESBulkIndexer._estimate_json_bytes(item) for key, item in value.items())
+        if isinstance(value, (list, tuple)):
+            if value and isinstance(value[0], float):
+                return 2 + 21 * len(value)
+            return 2 + sum(ESBulkIndexer._estimate_json_bytes(item) + 1 for item in value)
+        if hasattr(value, "dtype") and hasattr(value, "size"):
+            return 2 + 21 * int(value.size)
+        return len(str(value)) + 2
+
+    def _iter_action_batches(self, actions: Iterable[dict[str, Any]], get_batch_size: Callable[[], int], max_batch_bytes: int) -> Iterator[Tuple[list[dict[str, Any]], int]]:
+        """
+        Group a stream of bulk actions into batches capped by document count and payload size.
+
+        Args:
+            actions (Iterable[dict[str, Any]]): The bulk actions to group.
+            get_batch_size (Callable[[], int]): Returns the maximum number of actions for the batch being built.
+            max_batch_bytes (int): The approximate maximum serialized size of a batch.
+
+        Yields:
+            Tuple[list[dict[str, Any]], int]: A batch of actions and its approximate size in bytes.
+        """
+        batch = []
+        batch_bytes = 0
+        batch_size = get_batch_size()
+        for action in actions:
+            action_bytes = self._estimate_json_bytes(action)
+            if batch and (len(batch) >= batch_size or batch_bytes + action_bytes > max_batch_bytes):
+                yield batch, batch_bytes
+                batch = []
+                batch_bytes = 0
+                batch_size = get_batch_size()
+            batch.append(action)
+            batch_bytes += action_bytes
+        if batch:
+            yield batch, batch_bytes
+
+    def _upload_batch(self, index_name: str, batch_number: int, actions: list[dict[str, Any]], batch_bytes: int,
+                      controller: Optional[AdaptiveBulkController] = None) -> dict[str, Any]:
+        """
+        Send one batch of actions in a single bulk request and report its outcome.
+
+        With a controller, items rejected with a retryable status (and whole requests that time out
+        or are rejected) are retried with exponential backoff; anything still failing afterwards is
+        written to the controller's dead-letter file.
+
+        Returns:
+            dict: Per-batch stats (document count, bytes, successes, failures, retries, duration and last error, if any).
+        """
+        stats = {
+            "batch": batch_number,
+            "documents": len(actions),
+            "bytes": batch_bytes,
+            "success": 0,
+            "failed": 0,
+            "retried": 0,
+            "seconds": 0.0,
+            "error": None
+        }
+        start = time.perf_counter()
+        attempt = 0
+        while actions:
+            request_start = time.perf_counter()
+            try:
+                success, errors = bulk(self.conn, actions, chunk_size=len(actions), raise_on_error=False)
+            except Exception as e:
+                stats["error"] = str(e)
+                if controller is None or not controller.is_retryable_exception(e) or attempt >= controller.max_retries:
+                    stats["failed"] += len(actions)
+                    logger.error(f"An error occurred while uploading batch {batch_number} to {index_name}: {e}")
+                    if controller is not None:
+                        controller.write_dead_letters(actions, [str(e)] * len(actions))
+                    break
+                controller.record_rejection()
+                attempt += 1
+                stats["retried"] += len(actions)
+                backoff = controller.backoff_seconds(attempt)
+                logger.warning(f"Batch {batch_number}: request to {index_name} failed ({e}), retry {attempt} in {backoff:.1f}s")
+                time.sleep(backoff)
+                continue
+
+            stats["success"] += success
+            if success:
+                logger.info(f"Batch {batch_number}: Successfully indexed {success} documents to {index_name}")
+            if controller is None:
+                stats["failed"] += len(errors)
+                if errors:
+                    logger.warning(f"Batch {batch_number}: Failed to index {len(errors)} documents")
+                break
+
+            actions_by_id = {action["_id"]: action for action in actions}
+            retryable, permanent, permanent_errors = [], [], []
+            for error in errors:
+                item = next(iter(error.values()))
+                action = actions_by_id.get(item.get("_id"))
+                if action is None:
+                    continue
+                if item.get("status") in controller.RETRYABLE_STATUSES and attempt < controller.max_retries:
+                    retryable.append(action)
+                else:
+                    permanent.append(action)
+                    permanent_errors.append(item)
+            controller.record_latency(time.perf_counter() - request_start, rejected_items=len(retryable))
+
+            if permanent:
+                stats["failed"] += len(permanent)
+                logger.warning(f"Batch {batch_number}: Failed to index {len(permanent)} documents")
+                controller.write_dead_letters(permanent, permanent_errors)
+            actions = retryable
+            if actions:
+                attempt += 1
+                stats["retried"] += len(actions)
+                backoff = controller.backoff_seconds(attempt)
+                logger.warning(f"Batch {batch_number}: {len(actions)} documents rejected, retry {attempt} in {backoff:.1f}s")
+                time.sleep(backoff)
+        self._mark_index_written(index_name)
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def stream_bulk_upload_documents(self, index_name: str, documents: Iterable[dict[str, Any]], id_col: str,
+                                     batch_size: int = 1000, max_batch_bytes: int = 10 * 1024 * 1024,
+                                     num_workers: int = 4, max_pending_batches: Optional[int] = None,
+                                     controller: Optional[AdaptiveBulkController] = None,
+                                     on_batch_done: Optional[Callable[[dict[str, Any], list[str]], None]] = None) -> dict[str, Any]:
+        """
+        Bulk upload a stream of documents, sending several bulk requests concurrently.
+
+        Documents are consumed lazily from any iterable or generator, so at most
+        `max_pending_batches` batches are held in memory at any time.
+
+        Args:
+            index_name (str): The name of the index.
+            documents (Iterable[dict[str, Any]]): The documents to upload.
+            id_col (str): The name of the column to use as the document ID.
+            batch_size (int): The maximum number of documents per bulk request. Default is 1000.
+            max_batch_bytes (int): The approximate maximum payload size per bulk request. Default is 10MB.
+            num_workers (int): The number of bulk requests in flight at once. Default is 4.
+            max_pending_batches (Optional[int]): The number of batches buffered ahead of the workers.
+                Defaults to twice the number of workers.
+            controller (Optional[AdaptiveBulkController]): If given, it sets the batch size (overriding `batch_size`),
+                retries rejected items with backoff and dead-letters permanent failures.
+            on_batch_done (Optional[Callable]): Called from the calling thread as each batch finishes, with the batch stats
+                (including `offset`, the position of the batch's first document in the stream) and the batch's
+                document IDs, e.g. IngestCheckpoint.record_batch.
+
+        Returns:
+            dict: Totals (`total_success`, `total_failed`, `total_batches`) and per-batch stats under `batches`.
+        """
+        max_pending_batches = max_pending_batches or num_workers * 2
+        actions = (self._build_upsert_action(index_name, document, id_col) for document in documents)
+        results = {"total_success": 0, "total_failed": 0, "total_batches": 0, "batches": []}
+
+        batch_positions = {}
+
+        def collect(done):
+            for future in done:
+                batch_stats = future.result()
+                batch_stats["offset"], batch_ids = batch_positions.pop(future)
+                if on_batch_done is not None:
+                    on_batch_done(batch_stats, batch_ids)
+                results["total_success"] += batch_stats["success"]
+                results["total_failed"] += batch_stats["failed"]
+                results["total_batches"] += 1
+                results["batches"].append(batch_stats)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            pending = set()
+            get_batch_size = controller.get_batch_size if controller is not None else (lambda: batch_size)
+            batches = self._iter_action_batches(actions, get_batch_size, max_batch_bytes)
+            offset = 0
+            for batch_number, (batch, batch_bytes) in enumerate(batches, start=1):
+                future = executor.submit(self._upload_batch, index_name, batch_number, batch, batch_bytes, controller)
+                batch_positions[future] = (offset, [action["_id"] for action in batch])
+                offset += len(batch)
+                pending.add(future)
+                if len(pending) >= max_pending_batches:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            done, _ = wait(pending)
+            collect(done)
+
+        results["batches"].sort(key=lambda batch_stats: batch_stats["batch"])
+        elapsed = time.perf_counter() - start
+        logger.info(f"Total documents successfully indexed to {index_name}: {results['total_success']} "
+                    f"in {results['total_batches']} batches ({elapsed:.1f}s)")
+        if results["total_failed"]:
+            logger.warning(f"Total documents failed to index: {results['total_failed']}")
+
+        return results
+
 
     def bulk_delete_documents(self, index_name: str, document_ids: list[str]) -> int:
         """
@@ -300,6 +966,7 @@ class ESBulkIndexer(ESIndexer):
 
         try:
             success, failed = bulk(self.conn, actions)
+            self._mark_index_written(index_name)
             logger.info(f"Successfully deleted {success} documents from {index_name}")
             if failed:
                 logger.warning(f"Failed to delete {len(failed)} documents")
@@ -326,6 +993,7 @@ class ESBulkIndexer(ESIndexer):
 
         try:
             response = self.conn.reindex(body=query, wait_for_completion=True)
+            self._mark_index_written(target_index)
             logger.info(f"Successfully reindexed documents from {source_index} to {target_index}")
             return response
         except Exception as e:
@@ -334,8 +1002,67 @@ class ESBulkIndexer(ESIndexer):
 
 class ESQueryMaker(ESConnector):
 
-    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None):
-        super().__init__(cloud_id, credentials)
+    def __init__(self, cloud_id: str, credentials: Optional[Tuple[str, str]] = None,
+                 result_cache: Optional[QueryResultCache] = None, source_excludes: Optional[List[str]] = None,
+                 **connection_options: Any):
+        """
+        Initialize the ESQueryMaker.
+
+        Args:
+            result_cache (Optional[QueryResultCache]): If given, search_index and hybrid_vector_search
+                answer repeated searches from it until the TTL runs out or the index is written to.
+            source_excludes (Optional[List[str]]): Fields never returned in `_source` unless asked for by name.
+                Default is ["embedding"], so hits do not carry their dense vectors back over the wire.
+        """
+        self.result_cache = result_cache
+        self.source_excludes = list(source_excludes) if source_excludes is not None else ["embedding"]
+        super().__init__(cloud_id, credentials, **connection_options)
+
+    def _get_cached(self, index_name: str, cache_key: Any) -> Tuple[Optional[Any], int]:
+        """
+        Look a search up in the result cache. Returns the cached response (or None) and the
+        index generation to store a fresh response under.
+        """
+        generation = IndexGenerations.get(self.cloud_id, index_name)
+        if self.result_cache is None:
+            return None, generation
+        response = self.result_cache.get(self.cloud_id, index_name, cache_key)
+        if response is not None:
+            logger.info(f"Search on index: {index_name} served from the result cache")
+        return response, generation
+
+    def _put_cached(self, index_name: str, cache_key: Any, response: Any, generation: int) -> None:
+        if self.result_cache is not None:
+            self.result_cache.put(self.cloud_id, index_name, cache_key, response, generation)
+
+    def _response_shape(self, source_fields: Optional[List[str]] = None, retrieve_fields: Optional[List[Any]] = None,
+                        docvalue_fields: Optional[List[Any]] = None, exclude_fields: Iterable[str] = ()) -> Dict:
+        """
+        Build the response-shaping part of a search body.
+
+        Args:
+            source_fields (Optional[List[str]]): The `_source` fields to return. None returns everything
+                but the excluded fields; an empty list turns `_source` off.
+            retrieve_fields (Optional[List[Any]]): Fields to return through the `fields` option.
+            docvalue_fields (Optional[List[Any]]): Fields to return from doc values.
+            exclude_fields (Iterable[str]): Fields to exclude on top of `source_excludes`, e.g. the vector field searched.
+
+        Returns:
+            Dict: The `_source`, `fields` and `docvalue_fields` entries to merge into a search body.
+        """
+        requested = set(source_fields or ())
+        excludes = [field for field in dict.fromkeys([*self.source_excludes, *exclude_fields]) if field not in requested]
+        if source_fields is None:
+            shape = {"_source": {"excludes": excludes}} if excludes else {}
+        elif not source_fields:
+            shape = {"_source": False}
+        else:
+            shape = {"_source": {"includes": list(source_fields), "excludes": excludes}}
+        if retrieve_fields:
+            shape["fields"] = list(retrieve_fields)
+        if docvalue_fields:
+            shape["docvalue_fields"] = list(docvalue_fields)
+        return shape
 
     def pretty_print_results(self, results: Dict) -> None:
         """
@@ -359,7 +1086,8 @@ class ESQueryMaker(ESConnector):
             print(f"Error in pretty printing results: {e}")
 
 
-    def search_index(self, index_name: str, query: str, fields: List[str]) -> Dict:
+    def search_index(self, index_name: str, query: str, fields: List[str], source_fields: Optional[List[str]] = None,
+                     retrieve_fields: Optional[List[Any]] = None, docvalue_fields: Optional[List[Any]] = None) -> Dict:
         """
         Search for a query in a specific index over given fields.
 
@@ -367,6 +1095,10 @@ class ESQueryMaker(ESConnector):
             index_name (str): The name of the index to search.
             query (str): The query string to search for.
             fields (List[str]): The list of fields to search over.
+            source_fields (Optional[List[str]]): The `_source` fields to return; [] returns no `_source`.
+                By default everything but the excluded vector fields is returned.
+            retrieve_fields (Optional[List[Any]]): Fields to return through the `fields` option instead of `_source`.
+            docvalue_fields (Optional[List[Any]]): Fields to return from doc values.
 
         Returns:
             Dict: The search results.
@@ -378,9 +1110,14 @@ class ESQueryMaker(ESConnector):
                         "query": query,
                         "fields": fields
                     }
-                }
+                },
+                **self._response_shape(source_fields, retrieve_fields, docvalue_fields)
             }
+            response, generation = self._get_cached(index_name, search_body)
+            if response is not None:
+                return response
             response = self.conn.search(index=index_name, body=search_body)
+            self._put_cached(index_name, search_body, response, generation)
             logger.info(f"Search executed on index: {index_name} with query: {query}")
             return response
         except Exception as e:
@@ -401,12 +1138,83 @@ class ESQueryMaker(ESConnector):
         
         return should_clauses
 
+    def _fuse_hits(self, hit_lists: List[List[Dict]], fusion: str, weights: List[float],
+                   rank_constant: int, num_results: int) -> List[Dict]:
+        """
+        Fuse several ranked hit lists into one.
+
+        Args:
+            hit_lists (List[List[Dict]]): The ranked hits of each retriever.
+            fusion (str): "rrf" for reciprocal rank fusion, or "weighted" for a weighted sum of min-max normalized scores.
+            weights (List[float]): The weight of each retriever.
+            rank_constant (int): The RRF rank constant; higher values flatten the contribution of top ranks.
+            num_results (int): Number of fused results to return.
+
+        Returns:
+            List[Dict]: The fused hits, with `_score` replaced by the fused score.
+        """
+        fused_scores = {}
+        fused_hits = {}
+        for hits, weight in zip(hit_lists, weights):
+            if fusion == "weighted" and hits:
+                scores = [hit["_score"] or 0.0 for hit in hits]
+                low, high = min(scores), max(scores)
+                spread = high - low
+            for rank, hit in enumerate(hits, start=1):
+                doc_id = hit["_id"]
+                if fusion == "rrf":
+                    contribution = weight / (rank_constant + rank)
+                else:
+                    contribution = weight * (((hit["_score"] or 0.0) - low) / spread if spread else 1.0)
+                fused_scores[doc_id] = fused_scores.get(doc_id, 0.0) + contribution
+                fused_hits.setdefault(doc_id, hit)
+
+        ranked_ids = sorted(fused_scores, key=fused_scores.get, reverse=True)[:num_results]
+        return [{**fused_hits[doc_id], "_score": fused_scores[doc_id]} for doc_id in ranked_ids]
+
+    def _hybrid_search_body(self, query_text: str, query_vector: List[float], text_field: str,
+                            vector_field: str, num_candidates: int, shape: Optional[Dict] = None) -> Dict:
+        # Parse the query_text and create the should clauses
+        # should_clauses = self.parse_or_query(query_text, text_field)
+
+        return {
+            "knn": {
+                "field": vector_field,
+                "query_vector": query_vector,
+                "k": num_candidates,
+                "num_candidates": num_candidates
+            },
+            "query": {
+                "bool": {
+                    "must": [
+                        {
+                            "match":{
+                                text_field:query_text
+                            }
+                            # "bool": {
+                            #     "should": should_clauses,
+                            #     "minimum_should_match": 1
+                            # }
+                        }
+                    ]
+                }
+            },
+            **(shape or {})
+        }
+
     def hybrid_vector_search(self, index_name: str, query_text: str, query_vector: List[float], 
                             text_field: str, vector_field: str, 
-                            num_candidates: int = 100, num_results: int = 10) -> Dict:
+                            num_candidates: int = 100, num_results: int = 10,
+                            fusion: Optional[str] = None, weights: Tuple[float, float] = (1.0, 1.0),
+                            rank_constant: int = 60, rank_window_size: int = 50,
+                            source_fields: Optional[List[str]] = None, retrieve_fields: Optional[List[Any]] = None,
+                            docvalue_fields: Optional[List[Any]] = None) -> Dict:
         """
         Perform a hybrid search combining text and vector queries.
 
+        Only approximate kNN and BM25 are used, so no per-document script runs and latency
+        does not grow linearly with the index size. The vector field is left out of the returned `_source`.
+
         Args:
             index_name (str): The name of the index to search.
             query_text (str): The text query string.
@@ -415,52 +1223,252 @@ class ESQueryMaker(ESConnector):
             vector_field (str): The name of the dense vector field.
             num_candidates (int): Number of candidates to consider in the initial vector search.
             num_results (int): Number of final results to return.
+            fusion (Optional[str]): None to let Elasticsearch sum the kNN and BM25 scores in one search,
+                or "rrf" / "weighted" to run both retrievers in one _msearch and fuse the rankings client-side.
+            weights (Tuple[float, float]): The (kNN, BM25) weights used by client-side fusion.
+            rank_constant (int): The RRF rank constant.
+            rank_window_size (int): How many hits each retriever contributes to client-side fusion.
+            source_fields (Optional[List[str]]): The `_source` fields to return; [] returns no `_source`.
+                By default everything but the excluded vector fields is returned.
+            retrieve_fields (Optional[List[Any]]): Fields to return through the `fields` option instead of `_source`.
+            docvalue_fields (Optional[List[Any]]): Fields to return from doc values.
 
         Returns:
             Dict: The search results.
         """
+        if fusion is not None:
+            return self.fused_hybrid_search(index_name, query_text, query_vector, text_field, vector_field,
+                                            num_candidates=num_candidates, num_results=num_results, fusion=fusion,
+                                            weights=weights, rank_constant=rank_constant,
+                                            rank_window_size=rank_window_size, source_fields=source_fields,
+                                            retrieve_fields=retrieve_fields, docvalue_fields=docvalue_fields)
         try:
-            # Parse the query_text and create the should clauses
-            # should_clauses = self.parse_or_query(query_text, text_field)
+            shape = self._response_shape(source_fields, retrieve_fields, docvalue_fields, exclude_fields=[vector_field])
+            search_body = self._hybrid_search_body(query_text, query_vector, text_field, vector_field, num_candidates,
+                                                   shape)
+            cache_key = {**search_body, "size": num_results}
+            response, generation = self._get_cached(index_name, cache_key)
+            if response is not None:
+                return response, search_body
+            response = self.conn.search(index=index_name, body=search_body, size=num_results)
+            self._put_cached(index_name, cache_key, response, generation)
+            logger.info(f"Hybrid search executed on index: {index_name} with text query: {query_text}")
+            return response, search_body
+        except Exception as e:
+            logger.error(f"Error executing hybrid search on index: {index_name}. Error: {e}")
+            raise e
 
-            search_body = {
+    def fused_hybrid_search(self, index_name: str, query_text: str, query_vector: List[float],
+                            text_field: str, vector_field: str,
+                            num_candidates: int = 100, num_results: int = 10, fusion: str = "rrf",
+                            weights: Tuple[float, float] = (1.0, 1.0), rank_constant: int = 60,
+                            rank_window_size: int = 50, source_fields: Optional[List[str]] = None,
+                            retrieve_fields: Optional[List[Any]] = None,
+                            docvalue_fields: Optional[List[Any]] = None) -> Tuple[Dict, Dict]:
+        """
+        Run an approximate kNN search and a BM25 search in one _msearch round trip and fuse the results client-side.
+
+        Args:
+            index_name (str): The name of the index to search.
+            query_text (str): The text query string.
+            query_vector (List[float]): The query vector for semantic search.
+            text_field (str): The name of the text field to search.
+            vector_field (str): The name of the dense vector field.
+            num_candidates (int): Number of HNSW candidates to consider per shard.
+            num_results (int): Number of fused results to return.
+            fusion (str): "rrf" for reciprocal rank fusion, or "weighted" for a weighted sum of min-max normalized scores.
+            weights (Tuple[float, float]): The (kNN, BM25) weights.
+            rank_constant (int): The RRF rank constant.
+            rank_window_size (int): How many hits each retriever contributes to the fusion.
+            source_fields (Optional[List[str]]): The `_source` fields to return; [] returns no `_source`.
+                By default everything but the excluded vector fields is returned.
+            retrieve_fields (Optional[List[Any]]): Fields to return through the `fields` option instead of `_source`.
+            docvalue_fields (Optional[List[Any]]): Fields to return from doc values.
+
+        Returns:
+            Tuple[Dict, Dict]: A search-response-shaped dict with the fused hits, and the search bodies that were sent.
+        """
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}. Expected 'rrf' or 'weighted'")
+        shape = self._response_shape(source_fields, retrieve_fields, docvalue_fields, exclude_fields=[vector_field])
+        search_body = self._fused_search_bodies(query_text, query_vector, text_field, vector_field,
+                                                num_candidates, max(num_results, rank_window_size), shape)
+        cache_key = {"searches": search_body, "fusion": fusion, "weights": list(weights),
+                     "rank_constant": rank_constant, "size": num_results}
+        try:
+            response, generation = self._get_cached(index_name, cache_key)
+            if response is not None:
+                return response, search_body
+            start = time.perf_counter()
+            responses = self.msearch(index_name, list(search_body.values()))
+            response = self._fuse_responses(index_name, dict(zip(search_body, responses)), fusion, weights,
+                                            rank_constant, num_results)
+            response["took"] = int((time.perf_counter() - start) * 1000)
+            self._put_cached(index_name, cache_key, response, generation)
+            logger.info(f"Fused ({fusion}) hybrid search executed on index: {index_name} with text query: {query_text}")
+            return response, search_body
+        except Exception as e:
+            logger.error(f"Error executing fused hybrid search on index: {index_name}. Error: {e}")
+            raise e
+
+    def _fused_search_bodies(self, query_text: str, query_vector: List[float], text_field: str,
+                             vector_field: str, num_candidates: int, window: int,
+                             shape: Optional[Dict] = None) -> Dict[str, Dict]:
+        return {
+            "knn": {
                 "knn": {
                     "field": vector_field,
                     "query_vector": query_vector,
-                    "k": num_candidates,
-                    "num_candidates": num_candidates
+                    "k": window,
+                    "num_candidates": max(num_candidates, window)
                 },
-                "query": {
-                    "bool": {
-                        "must": [
-                            {
-                                "match":{
-                                    text_field:query_text
-                                }
-                                # "bool": {
-                                #     "should": should_clauses,
-                                #     "minimum_should_match": 1
-                                # }
-                            }
-                        ],
-                        "should": [
-                            {
-                                "script_score": {
-                                    "query": {"match_all": {}},
-                                    "script": {
-                                        "source": "cosineSimilarity(params.query_vector, '" + vector_field + "') + 1.0",
-                                        "params": {"query_vector": query_vector}
-                                    }
-                                }
-                            }
-                        ]
-                    }
-                }
+                "size": window,
+                **(shape or {})
+            },
+            "bm25": {
+                "query": {"match": {text_field: query_text}},
+                "size": window,
+                **(shape or {})
             }
-            
-            response = self.conn.search(index=index_name, body=search_body, size=num_results)
-            logger.info(f"Hybrid search executed on index: {index_name} with text query: {query_text}")
-            return response, search_body
+        }
+
+    def _fuse_responses(self, index_name: str, responses: Dict[str, Dict], fusion: str,
+                        weights: Tuple[float, float], rank_constant: int, num_results: int) -> Dict:
+        """
+        Fuse the per-retriever responses of one query into a single search-response-shaped dict.
+        A failed retriever is logged and skipped; if every retriever failed, a RuntimeError is raised.
+        """
+        hit_lists = []
+        for name, response in responses.items():
+            if "error" in response:
+                logger.warning(f"{name} retriever failed on index: {index_name}. Error: {response['error']}")
+                hit_lists.append([])
+            else:
+                hit_lists.append(response["hits"]["hits"])
+        if all("error" in response for response in responses.values()):
+            raise RuntimeError(f"All retrievers failed on index: {index_name}")
+
+        hits = self._fuse_hits(hit_lists, fusion, list(weights), rank_constant, num_results)
+        return {
+            "took": max(response.get("took", 0) for response in responses.values()),
+            "hits": {
+                "total": {"value": len(hits), "relation": "eq"},
+                "max_score": hits[0]["_score"] if hits else None,
+                "hits": hits
+            }
+        }
+
+    def msearch(self, index_name: str, search_bodies: List[Dict]) -> List[Dict]:
+        """
+        Send several search bodies to an index in a single _msearch request.
+
+        Args:
+            index_name (str): The name of the index to search.
+            search_bodies (List[Dict]): The search bodies, one per search.
+
+        Returns:
+            List[Dict]: One response per search body, in order. A search that failed on its own
+                comes back as a dict with an `error` key instead of raising.
+        """
+        # Elasticsearch rejects an _msearch with no searches
+        if not search_bodies:
+            return []
+        searches = []
+        for body in search_bodies:
+            searches.extend([{"index": index_name}, body])
+        try:
+            responses = self.conn.msearch(searches=searches)["responses"]
+            logger.info(f"Multi-search of {len(search_bodies)} searches executed on index: {index_name}")
+            return responses
         except Exception as e:
-            logger.error(f"Error executing hybrid search on index: {index_name}. Error: {e}")
-            raise e
\ No newline at end of file
+            logger.error(f"Error executing multi-search on index: {index_name}. Error: {e}")
+            raise e
+
+    def batch_search(self, index_name: str, queries: List[Tuple[str, Optional[List[float]]]], text_field: str,
+                     vector_field: Optional[str] = None, num_candidates: int = 100, num_results: int = 10,
+                     fusion: Optional[str] = None, weights: Tuple[float, float] = (1.0, 1.0),
+                     rank_constant: int = 60, rank_window_size: int = 50, source_fields: Optional[List[str]] = None,
+                     retrieve_fields: Optional[List[Any]] = None,
+                     docvalue_fields: Optional[List[Any]] = None) -> List[Dict]:
+        """
+        Run many searches in one _msearch round trip.
+
+        Each query is a (text, vector) pair. Queries with a vector run as hybrid searches
+        (the same body as hybrid_vector_search, or kNN + BM25 fused client-side when `fusion` is set);
+        queries whose vector is None run as a BM25 match on `text_field`.
+
+        Args:
+            index_name (str): The name of the index to search.
+            queries (List[Tuple[str, Optional[List[float]]]]): The (query text, query vector) pairs.
+            text_field (str): The name of the text field to search.
+            vector_field (Optional[str]): The name of the dense vector field. Required for queries with a vector.
+            num_candidates (int): Number of candidates to consider in the vector search.
+            num_results (int): Number of results to return per query.
+            fusion (Optional[str]): None, "rrf" or "weighted"; see hybrid_vector_search.
+            weights (Tuple[float, float]): The (kNN, BM25) weights used by client-side fusion.
+            rank_constant (int): The RRF rank constant.
+            rank_window_size (int): How many hits each retriever contributes to client-side fusion.
+            source_fields (Optional[List[str]]): The `_source` fields to return; [] returns no `_source`.
+                By default everything but the excluded vector fields is returned.
+            retrieve_fields (Optional[List[Any]]): Fields to return through the `fields` option instead of `_source`.
+            docvalue_fields (Optional[List[Any]]): Fields to return from doc values.
+
+        Returns:
+            List[Dict]: One search response per query, in order. A query that failed comes back
+                as a dict with an `error` key, so one bad query does not fail the batch.
+        """
+        shape = self._response_shape(source_fields, retrieve_fields, docvalue_fields,
+                                     exclude_fields=[vector_field] if vector_field else [])
+        groups = self._batch_search_groups(queries, text_field, vector_field, num_candidates, num_results,
+                                           fusion, rank_window_size, shape)
+        responses = self.msearch(index_name, [body for group in groups for body in group.values()])
+        return self._split_batch_responses(index_name, groups, responses, fusion, weights, rank_constant, num_results)
+
+    def _batch_search_groups(self, queries: List[Tuple[str, Optional[List[float]]]], text_field: str,
+                             vector_field: Optional[str], num_candidates: int, num_results: int,
+                             fusion: Optional[str], rank_window_size: int,
+                             shape: Optional[Dict] = None) -> List[Dict[str, Dict]]:
+        """
+        Build the search bodies of each batched query, keyed by retriever name.
+        """
+        if fusion not in (None, "rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}. Expected None, 'rrf' or 'weighted'")
+        groups = []
+        for query_text, query_vector in queries:
+            if query_vector is not None and vector_field is None:
+                raise ValueError(f"Query {query_text!r} has a vector, but no vector_field was given")
+            if query_vector is None:
+                body = {"query": {"match": {text_field: query_text}}, "size": num_results, **(shape or {})}
+                groups.append({"text": body})
+            elif fusion is None:
+                body = self._hybrid_search_body(query_text, query_vector, text_field, vector_field, num_candidates,
+                                                shape)
+                groups.append({"hybrid": {**body, "size": num_results}})
+            else:
+                groups.append(self._fused_search_bodies(query_text, query_vector, text_field, vector_field,
+                                                        num_candidates, max(num_results, rank_window_size), shape))
+        return groups
+
+    def _split_batch_responses(self, index_name: str, groups: List[Dict[str, Dict]], responses: List[Dict],
+                               fusion: Optional[str], weights: Tuple[float, float], rank_constant: int,
+                               num_results: int) -> List[Dict]:
+        """
+        Split a flat list of _msearch responses back into one response per batched query, fusing where needed.
+        """
+        responses = iter(responses)
+        results = []
+        for group in groups:
+            group_responses = {name: next(responses) for name in group}
+            if len(group_responses) == 1:
+                results.append(next(iter(group_responses.values())))
+                continue
+            try:
+                results.append(self._fuse_responses(index_name, group_responses, fusion, weights,
+                                                    rank_constant, num_results))
+            except RuntimeError as e:
+                results.append({"error": str(e)})
+
+        failed = sum("error" in result for result in results)
+        if failed:
+            logger.warning(f"{failed} of {len(results)} batched searches failed on index: {index_name}")
+        return results
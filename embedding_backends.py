@@ -0,0 +1,98 @@
+import copy
+import os
+
+import torch
+
+class TorchBackend:
+    '''
+    Full precision transformers model. This is the baseline every other backend is compared against.
+    '''
+    name = "torch"
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+
+    def forward(self, inputs):
+        '''
+        Given a padded batch of tokenizer outputs, return the last hidden states as a torch tensor.
+        '''
+        with torch.inference_mode():
+            return self.model(**inputs.to(self.device))[0]
+
+class QuantizedTorchBackend(TorchBackend):
+    '''
+    Dynamic int8 quantization of every Linear layer. CPU only.
+    Weights are stored in int8 and activations are quantized on the fly.
+    '''
+    name = "torch-int8"
+
+    def __init__(self, model):
+        quantized = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).cpu(),
+                                                           {torch.nn.Linear},
+                                                           dtype=torch.qint8)
+        quantized.eval()
+        super().__init__(quantized, "cpu")
+
+class _HiddenStateModule(torch.nn.Module):
+    '''
+    Wraps a transformers model so it takes positional tensors and returns only the last hidden states,
+    which is what the ONNX exporter needs.
+    '''
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *args):
+        return self.model(**dict(zip(self.input_names, args)))[0]
+
+class ONNXBackend:
+    '''
+    ONNX Runtime session on CPU. The model is exported to onnx_path the first time
+    and the exported file is reused afterwards.
+    '''
+    name = "onnx"
+
+    def __init__(self, model, tokenizer, onnx_path, providers=None, intra_op_num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend requires onnxruntime (pip install onnxruntime)") from e
+
+        if not os.path.exists(onnx_path):
+            self.export(model, tokenizer, onnx_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_num_threads:
+            options.intra_op_num_threads = intra_op_num_threads
+        self.session = ort.InferenceSession(onnx_path,
+                                            sess_options=options,
+                                            providers=providers or ["CPUExecutionProvider"])
+        self.input_names = [session_input.name for session_input in self.session.get_inputs()]
+
+    @staticmethod
+    def export(model, tokenizer, onnx_path):
+        '''
+        Export the model to ONNX with dynamic batch and sequence axes.
+        '''
+        sample = tokenizer(["Sample text for export"], return_tensors="pt")
+        input_names = list(sample.keys())
+        wrapper = _HiddenStateModule(copy.deepcopy(model).cpu().eval(), input_names)
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(wrapper,
+                              tuple(sample[name] for name in input_names),
+                              onnx_path,
+                              input_names=input_names,
+                              output_names=["last_hidden_state"],
+                              dynamic_axes=dynamic_axes,
+                              opset_version=14)
+        print(f"Exported ONNX model to {onnx_path}")
+
+    def forward(self, inputs):
+        feeds = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(None, feeds)[0])
+
+BACKENDS = ("torch", "torch-int8", "onnx")
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, dim, shard_size=65536, max_entries=None, max_bytes=None):
+        '''
+        Disk-backed, content-addressed embedding cache.
+        Vectors live in fixed-size memory-mapped float32 shards; a sqlite index maps
+        each key to its (shard, row) slot and tracks last use for LRU eviction.
+        max_entries and max_bytes both cap the cache size; the tighter one wins.
+        '''
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.shard_size = shard_size
+        limits = [limit for limit in (max_entries, max_bytes and max_bytes // (dim * 4)) if limit]
+        self.max_entries = min(limits) if limits else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._shards = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, shard INTEGER, row INTEGER, last_used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS free_slots (shard INTEGER, row INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        stored_dim = self._get_meta("dim")
+        if stored_dim is None:
+            self._set_meta("dim", dim)
+            self._set_meta("next_slot", 0)
+        elif stored_dim != dim:
+            raise ValueError(f"Cache at {cache_dir} holds {stored_dim}-dimensional vectors, not {dim}")
+        self.db.commit()
+
+    @staticmethod
+    def make_key(model_name, pooling, normalize, text):
+        '''
+        Hash of (model name, pooling mode, normalization, normalized text).
+        Text is NFC-normalized and whitespace-collapsed, so trivial reformatting still hits.
+        '''
+        text = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{model_name}\0{pooling}\0{int(bool(normalize))}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get_meta(self, name):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            path = os.path.join(self.cache_dir, f"shard_{shard:05d}.f32")
+            mode = "r+" if os.path.exists(path) else "w+"
+            self._shards[shard] = np.memmap(path, dtype=np.float32, mode=mode, shape=(self.shard_size, self.dim))
+        return self._shards[shard]
+
+    def _allocate_slot(self):
+        row = self.db.execute("SELECT rowid, shard, row FROM free_slots LIMIT 1").fetchone()
+        if row:
+            self.db.execute("DELETE FROM free_slots WHERE rowid = ?", (row[0],))
+            return row[1], row[2]
+        next_slot = self._get_meta("next_slot")
+        self._set_meta("next_slot", next_slot + 1)
+        return divmod(next_slot, self.shard_size)
+
+    def get_many(self, keys):
+        '''
+        Look up many keys at once.
+        Returns a float32 matrix with one row per key and a boolean mask of which rows were found.
+        '''
+        vectors = np.zeros((len(keys), self.dim), dtype=np.float32)
+        found = np.zeros(len(keys), dtype=bool)
+        with self._lock:
+            now = time.time()
+            hit_keys = []
+            for i, key in enumerate(keys):
+                row = self.db.execute("SELECT shard, row FROM entries WHERE key = ?", (key,)).fetchone()
+                if row:
+                    vectors[i] = self._shard(row[0])[row[1]]
+                    found[i] = True
+                    hit_keys.append((now, key))
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", hit_keys)
+            self.db.commit()
+            self.hits += len(hit_keys)
+            self.misses += len(keys) - len(hit_keys)
+        return vectors, found
+
+    def put_many(self, keys, vectors):
+        '''
+        Store one vector per key, then evict least recently used entries if over capacity.
+        '''
+        with self._lock:
+            now = time.time()
+            touched = set()
+            for key, vector in zip(keys, vectors):
+                row = self.db.execute("SELECT shard, row FROM entries WHERE key = ?", (key,)).fetchone()
+                shard, slot = row if row else self._allocate_slot()
+                self._shard(shard)[slot] = vector
+                touched.add(shard)
+                self.db.execute("INSERT OR REPLACE INTO entries (key, shard, row, last_used) VALUES (?, ?, ?, ?)",
+                                (key, shard, slot, now))
+            for shard in touched:
+                self._shards[shard].flush()
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        if self.max_entries is None:
+            return
+        excess = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        stale = self.db.execute("SELECT key, shard, row FROM entries ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+        self.db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _, _ in stale])
+        self.db.executemany("INSERT INTO free_slots (shard, row) VALUES (?, ?)", [(shard, row) for _, shard, row in stale])
+        self.evictions += len(stale)
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        with self._lock:
+            for shard in self._shards.values():
+                shard.flush()
+            self._shards.clear()
+            self.db.close()
@@ -1,23 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
 import torch
 from transformers import pipeline
 from tqdm import tqdm
 
+from embedding_backends import BACKENDS, TorchBackend, QuantizedTorchBackend, ONNXBackend
+from embedding_cache import EmbeddingCache
+
+POOLING_MODES = ("cls", "mean")
+
 class EmbeddingModel:
-    def __init__(self, model_name):
-        if torch.backends.mps.is_available():
+    def __init__(self, model_name, pooling="cls", normalize=False, cache=None, device=None, backend="torch",
+                 query_cache_size=1024, query_cache=None, max_length=512, **backend_options):
+        if device is not None:
+            self.device = device
+            print(f"Using {device}")
+        elif torch.backends.mps.is_available():
             self.device = "mps"
             print("Using MPS")
         else:
             self.device = "cpu"
             print("Using CPU")
+        if pooling not in POOLING_MODES:
+            raise ValueError(f"Unknown pooling mode: {pooling}. Expected one of {POOLING_MODES}")
         ''' 
         Initialize embedding model and pipeline. 
         Load into mac GPU (Change to cuda if using nvidia)
         '''
+        self.model_name = model_name
+        self.pooling = pooling
+        self.normalize = normalize
+        # Longest input, in tokens, that is embedded before truncating; token chunk budgets should match it
+        self.max_length = max_length
+        self.cache = cache
+        self.query_cache_size = query_cache_size
+        self.query_cache = query_cache
+        self._query_embeddings = OrderedDict()
+        self._query_lock = threading.Lock()
+        self.query_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
         self.embedding_pipeline = pipeline("feature-extraction", 
                                             model=model_name, 
                                             trust_remote_code=True, 
                                             device=self.device)
+        self.tokenizer = self.embedding_pipeline.tokenizer
+        self.model = self.embedding_pipeline.model
+        self.model.eval()
+        self.set_backend(backend, **backend_options)
+
+    @property
+    def dimension(self):
+        '''
+        Length of the vectors this model returns, e.g. for the dense_vector mapping.
+        '''
+        return self.model.config.hidden_size
+
+    def _build_backend(self, backend, **backend_options):
+        if backend == "torch":
+            return TorchBackend(self.model, self.device)
+        if backend == "torch-int8":
+            return QuantizedTorchBackend(self.model)
+        if backend == "onnx":
+            onnx_path = backend_options.pop("onnx_path", None) or f"{self.model_name.replace('/', '_')}.onnx"
+            return ONNXBackend(self.model, self.tokenizer, onnx_path, **backend_options)
+        raise ValueError(f"Unknown backend: {backend}. Expected one of {BACKENDS}")
+
+    def set_backend(self, backend, **backend_options):
+        '''
+        Switch the inference backend used by encode and embed_documents.
+        "torch" is the full precision model, "torch-int8" is dynamic int8 quantization on CPU,
+        and "onnx" runs an exported copy of the model in ONNX Runtime (onnx_path sets where it is stored).
+        get_embeddings always uses the full precision pipeline.
+        '''
+        self.backend = self._build_backend(backend, **backend_options)
+        # Embeddings from the previous backend may differ slightly
+        self._query_embeddings = OrderedDict()
+        print(f"Using {self.backend.name} backend")
+
+    def _cache_key(self, text):
+        '''
+        Cache key for a text under the current model, pooling, normalization and backend.
+        '''
+        model_id = self.model_name if self.backend.name == "torch" else f"{self.model_name}@{self.backend.name}"
+        return EmbeddingCache.make_key(model_id, self.pooling, self.normalize, text)
         
     def get_embeddings(self, texts):
         ''' 
@@ -27,18 +94,188 @@ class EmbeddingModel:
         embeddings = self.embedding_pipeline(texts, 
                                             truncation=True, 
                                             padding=True, 
-                                            max_length=512)
+                                            max_length=self.max_length)
         return embeddings
 
-    def embed_documents(self, documents, text_field="chunk", batch_size=32):
+    def encode(self, texts, pooling=None, normalize=None, max_length=None):
+        '''
+        Given a list of strings, return one pooled embedding per string
+        as a contiguous float32 matrix of shape (len(texts), hidden_size).
+        Pooling happens inside the model, so per-token hidden states never leave torch.
+        Texts are truncated to max_length tokens (the model's max_length by default).
+        '''
+        inputs = self.tokenizer(texts,
+                                truncation=True,
+                                padding=True,
+                                max_length=max_length or self.max_length,
+                                return_tensors="pt")
+        return self._pool(inputs, pooling, normalize)
+
+    def _pool(self, inputs, pooling=None, normalize=None):
+        '''
+        Run the model over a padded batch of token ids and pool it into a float32 matrix.
+        '''
+        pooling = pooling or self.pooling
+        normalize = self.normalize if normalize is None else normalize
+        if pooling not in POOLING_MODES:
+            raise ValueError(f"Unknown pooling mode: {pooling}. Expected one of {POOLING_MODES}")
+
+        hidden_states = self.backend.forward(inputs)
+        with torch.inference_mode():
+            if pooling == "cls":
+                pooled = hidden_states[:, 0]
+            else:
+                mask = inputs["attention_mask"].to(hidden_states.device).unsqueeze(-1).to(hidden_states.dtype)
+                pooled = (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            if normalize:
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        return np.ascontiguousarray(pooled.float().cpu().numpy(), dtype=np.float32)
+
+    def check_backend_parity(self, texts, baseline="torch", **baseline_options):
+        '''
+        Embed texts with the current backend and with a baseline backend (full precision torch by default),
+        and report how far the current backend drifts: cosine similarity between the two embeddings
+        of each text, plus the time each backend took.
+        '''
+        baseline_backend = self._build_backend(baseline, **baseline_options)
+        current_backend = self.backend
+        timings = {}
+        outputs = {}
+        for label, backend in (("baseline", baseline_backend), ("current", current_backend)):
+            self.backend = backend
+            try:
+                start = time.perf_counter()
+                outputs[label] = self.encode(texts, normalize=True)
+                timings[label] = time.perf_counter() - start
+            finally:
+                self.backend = current_backend
+        cosine = np.sum(outputs["baseline"] * outputs["current"], axis=1)
+        report = {
+            "backend": current_backend.name,
+            "baseline": baseline_backend.name,
+            "mean_cosine": float(cosine.mean()),
+            "min_cosine": float(cosine.min()),
+            "max_drift": float(1.0 - cosine.min()),
+            "baseline_seconds": timings["baseline"],
+            "backend_seconds": timings["current"]
+        }
+        print(f"Parity {report['backend']} vs {report['baseline']}: "
+              f"mean cosine {report['mean_cosine']:.4f}, min cosine {report['min_cosine']:.4f}, "
+              f"{report['baseline_seconds']:.2f}s -> {report['backend_seconds']:.2f}s")
+        return report
+
+    def _plan_batches(self, lengths, max_tokens_per_batch, max_batch_size):
+        '''
+        Group text indices into batches of similar token length.
+        Indices are visited shortest first, so the padded length of a batch is the length
+        of its last member, and a batch is closed once padding it would exceed the token budget.
+        '''
+        batches = []
+        batch = []
+        for idx in sorted(range(len(lengths)), key=lengths.__getitem__):
+            if batch and ((len(batch) + 1) * lengths[idx] > max_tokens_per_batch or len(batch) >= max_batch_size):
+                batches.append(batch)
+                batch = []
+            batch.append(idx)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def encode_bucketed(self, texts, max_tokens_per_batch=16384, max_batch_size=256, max_length=None,
+                        pooling=None, normalize=None, show_progress=True):
+        '''
+        Like encode, but for many texts of mixed length.
+        Texts are tokenized once, bucketed by token length into batches sized by a token budget
+        (so short texts are not padded to the longest one), and the embeddings are returned
+        in the original order.
+        '''
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        encodings = self.tokenizer(texts, truncation=True, max_length=max_length or self.max_length)
+        input_ids = encodings["input_ids"]
+        batches = self._plan_batches([len(ids) for ids in input_ids], max_tokens_per_batch, max_batch_size)
+
+        embeddings = None
+        for batch in tqdm(batches, desc="Embedding documents", disable=not show_progress):
+            inputs = self.tokenizer.pad({key: [encodings[key][idx] for idx in batch] for key in encodings.keys()},
+                                        padding=True,
+                                        return_tensors="pt")
+            batch_embeddings = self._pool(inputs, pooling, normalize)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch] = batch_embeddings
+        return embeddings
+
+    def encode_cached(self, texts, max_tokens_per_batch=16384, max_batch_size=256):
+        '''
+        encode_bucketed through the model's embedding cache, if it has one.
+        Cached texts are read back from disk; only the misses are embedded and then stored.
+        '''
+        if self.cache is None or not texts:
+            return self.encode_bucketed(texts, max_tokens_per_batch=max_tokens_per_batch, max_batch_size=max_batch_size)
+        keys = [self._cache_key(text) for text in texts]
+        embeddings, found = self.cache.get_many(keys)
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            missing_embeddings = self.encode_bucketed([texts[i] for i in missing],
+                                                      max_tokens_per_batch=max_tokens_per_batch,
+                                                      max_batch_size=max_batch_size)
+            embeddings[missing] = missing_embeddings
+            self.cache.put_many([keys[i] for i in missing], missing_embeddings)
+        return embeddings
+
+    def embed_query(self, query_text):
+        '''
+        Embed a single query, for search.
+        Repeat queries (after whitespace/unicode normalization) are answered from an in-process LRU
+        of query_cache_size entries, then from the optional on-disk query_cache (an EmbeddingCache),
+        and only run through the model on a miss.
+        Returns a 1-D float32 vector; treat it as read-only, since it is shared with the cache.
+        '''
+        key = self._cache_key(query_text)
+        with self._query_lock:
+            embedding = self._query_embeddings.get(key)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(key)
+                self.query_stats["memory_hits"] += 1
+                return embedding
+
+        embedding = None
+        if self.query_cache is not None:
+            vectors, found = self.query_cache.get_many([key])
+            if found[0]:
+                embedding = vectors[0]
+                self.query_stats["disk_hits"] += 1
+        if embedding is None:
+            embedding = self.encode([query_text])[0]
+            self.query_stats["misses"] += 1
+            if self.query_cache is not None:
+                self.query_cache.put_many([key], embedding[None, :])
+
+        with self._query_lock:
+            self._query_embeddings[key] = embedding
+            while len(self._query_embeddings) > self.query_cache_size:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+
+    def query_cache_stats(self):
+        '''
+        Query embedding cache hits (in memory and on disk), misses and overall hit rate.
+        '''
+        lookups = sum(self.query_stats.values())
+        hits = self.query_stats["memory_hits"] + self.query_stats["disk_hits"]
+        return {**self.query_stats, "hit_rate": hits / lookups if lookups else 0.0}
+
+    def embed_documents(self, documents, text_field="chunk", batch_size=256, max_tokens_per_batch=16384):
         ''' 
         Given a list of document objects, grab the text, 
         batch embed, then put the embeddings into the document objects.
+        Batches are bucketed by token length: each holds at most batch_size documents
+        and at most max_tokens_per_batch tokens after padding.
+        If the model has a cache, only chunks missing from it are run through the model.
         '''
-        for i in tqdm(range(0, len(documents), batch_size), desc="Embedding documents"):
-            batch = documents[i:i+batch_size]
-            texts = [doc[text_field] for doc in batch]
-            embeddings = self.get_embeddings(texts)
-            for doc, embedding in zip(batch, embeddings):
-                doc['embedding'] = embedding[0][0]
+        texts = [doc[text_field] for doc in documents]
+        embeddings = self.encode_cached(texts, max_tokens_per_batch=max_tokens_per_batch, max_batch_size=batch_size)
+        for doc, embedding in zip(documents, embeddings):
+            doc['embedding'] = embedding.tolist()
         return documents
\ No newline at end of file
@@ -0,0 +1,144 @@
+import multiprocessing as mp
+import os
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+from tqdm import tqdm
+
+def _embedding_worker(model_name, pooling, normalize, num_threads, max_tokens_per_batch, task_queue, result_queue):
+    '''
+    Worker process: load a private CPU model copy with a pinned thread count,
+    then embed batches from the task queue straight into the caller's shared memory block.
+    '''
+    import torch
+    from embedding_model import EmbeddingModel
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    embedder = EmbeddingModel(model_name, pooling=pooling, normalize=normalize, device="cpu")
+    result_queue.put(("ready", embedder.model.config.hidden_size))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, shm_name, dim, rows, texts = task
+        try:
+            embeddings = embedder.encode_bucketed(texts,
+                                                  max_tokens_per_batch=max_tokens_per_batch,
+                                                  max_batch_size=len(texts),
+                                                  show_progress=False)
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                out = np.ndarray((shm.size // (dim * 4), dim), dtype=np.float32, buffer=shm.buf)
+                out[rows] = embeddings
+                del out
+            finally:
+                shm.close()
+            result_queue.put((task_id, None))
+        except Exception as e:
+            result_queue.put((task_id, f"{type(e).__name__}: {e}"))
+
+class EmbeddingPool:
+    def __init__(self, model_name, num_workers=None, threads_per_worker=None, pooling="cls", normalize=False,
+                 task_size=64, max_tokens_per_batch=16384):
+        '''
+        Pool of CPU worker processes, each with its own copy of the embedding model.
+        Texts are split into tasks of task_size, fed to the workers through a queue,
+        and the embeddings come back through one shared memory block per call rather than pickled lists.
+        By default the machine's cores are split evenly between workers.
+        '''
+        cpu_count = os.cpu_count() or 1
+        self.model_name = model_name
+        self.pooling = pooling
+        self.normalize = normalize
+        self.num_workers = num_workers or max(1, cpu_count // 4)
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.task_size = task_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.dim = None
+        self._context = mp.get_context("spawn")
+        self._task_queue = None
+        self._result_queue = None
+        self._workers = []
+
+    def start(self):
+        '''
+        Start the workers and wait until every one has loaded its model.
+        '''
+        if self._workers:
+            return self
+        self._task_queue = self._context.Queue()
+        self._result_queue = self._context.Queue()
+        for _ in range(self.num_workers):
+            worker = self._context.Process(target=_embedding_worker,
+                                           args=(self.model_name, self.pooling, self.normalize,
+                                                 self.threads_per_worker, self.max_tokens_per_batch,
+                                                 self._task_queue, self._result_queue),
+                                           daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        for _ in range(self.num_workers):
+            _, self.dim = self._get_result()
+        print(f"Embedding pool started: {self.num_workers} workers x {self.threads_per_worker} threads")
+        return self
+
+    def _get_result(self):
+        while True:
+            try:
+                return self._result_queue.get(timeout=5)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError("An embedding worker exited unexpectedly")
+
+    def encode(self, texts, show_progress=True):
+        '''
+        Embed texts across the pool. Returns a float32 matrix in input order.
+        Texts are sorted by length before being split into tasks, so each task pads little.
+        '''
+        if not self._workers:
+            self.start()
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        tasks = [order[i:i + self.task_size] for i in range(0, len(order), self.task_size)]
+        shm = shared_memory.SharedMemory(create=True, size=len(texts) * self.dim * 4)
+        try:
+            for task_id, rows in enumerate(tasks):
+                self._task_queue.put((task_id, shm.name, self.dim, rows, [texts[i] for i in rows]))
+            errors = []
+            for _ in tqdm(range(len(tasks)), desc="Embedding documents", disable=not show_progress):
+                task_id, error = self._get_result()
+                if error:
+                    errors.append(error)
+            if errors:
+                raise RuntimeError(f"{len(errors)} embedding tasks failed, first error: {errors[0]}")
+            embeddings = np.ndarray((len(texts), self.dim), dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+        return embeddings
+
+    def embed_documents(self, documents, text_field="chunk"):
+        '''
+        Same as EmbeddingModel.embed_documents, but spread over the pool.
+        '''
+        embeddings = self.encode([doc[text_field] for doc in documents])
+        for doc, embedding in zip(documents, embeddings):
+            doc['embedding'] = embedding.tolist()
+        return documents
+
+    def close(self):
+        for _ in self._workers:
+            self._task_queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
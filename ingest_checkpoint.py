@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class IngestCheckpoint:
+    def __init__(self, path, track_ids=True):
+        '''
+        Progress of an ingest run, kept in an append-only JSON-lines state file so an interrupted run can resume.
+        Pass record_batch as the on_batch_done callback of ESBulkIndexer.stream_bulk_upload_documents;
+        every fully successful bulk batch is then appended to the file and fsynced.
+        Two ways to resume, use one per run:
+        - by offset: committed_offset is the number of leading documents of the stream that are all committed
+          (batches finish out of order, so it only advances over a contiguous prefix); skip that many and
+          stream the rest.
+        - by ID: with track_ids, committed document IDs are kept too, and skip_committed filters them out
+          of the stream. Document IDs must be deterministic across runs for either way to work.
+        A batch that partly failed is not recorded, so it is sent again on resume; uploads are upserts,
+        so resending a document is harmless.
+        '''
+        self.path = path
+        self.track_ids = track_ids
+        self.committed_offset = 0
+        self.committed_ids = set()
+        self._base_offset = 0
+        self._finished_ranges = {}
+        self._load()
+        self._base_offset = self.committed_offset
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        complete_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A run killed mid-write leaves a partial last line
+                    break
+                complete_bytes += len(line)
+                record = json.loads(line)
+                self.committed_offset = max(self.committed_offset, record.get("offset", 0))
+                self.committed_ids.update(record.get("ids", []))
+        if complete_bytes < os.path.getsize(self.path):
+            os.truncate(self.path, complete_bytes)
+        logger.info(f"Resuming from checkpoint {self.path}: offset {self.committed_offset}, "
+                    f"{len(self.committed_ids)} committed IDs")
+
+    def record_batch(self, batch_stats, ids):
+        '''
+        Record a finished bulk batch. batch_stats["offset"] is the position of its first document
+        in the stream that was uploaded, which starts at the committed offset of the previous run.
+        Only "failed" decides whether the batch is committed: "error" also holds transient errors
+        from requests that were retried successfully.
+        '''
+        if batch_stats["failed"]:
+            return
+        start = self._base_offset + batch_stats["offset"]
+        self._finished_ranges[start] = start + len(ids)
+        while self.committed_offset in self._finished_ranges:
+            self.committed_offset = self._finished_ranges.pop(self.committed_offset)
+
+        record = {"offset": self.committed_offset}
+        if self.track_ids:
+            self.committed_ids.update(ids)
+            record["ids"] = list(ids)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def skip_committed(self, documents, id_col):
+        '''
+        Yield only the documents whose id_col is not committed yet.
+        '''
+        skipped = 0
+        for document in documents:
+            if document[id_col] in self.committed_ids:
+                skipped += 1
+                continue
+            yield document
+        if skipped:
+            logger.info(f"Skipped {skipped} documents already committed according to {self.path}")
+
+    def clear(self):
+        '''
+        Forget all progress, e.g. once the run has finished.
+        '''
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.committed_offset = self._base_offset = 0
+        self.committed_ids.clear()
+        self._finished_ranges.clear()
@@ -4,9 +4,11 @@ class LlamaIndexProcessor:
     def __init__(self):
         pass 
     
-    def load_documents(self, directory_path):
+    def load_documents(self, directory_path, filename_as_id=False):
         ''' 
         Load all documents in directory
+        With filename_as_id, document IDs are derived from the file path (and page), so they,
+        and the chunk IDs derived from them, stay the same across runs
         '''
-        reader = SimpleDirectoryReader(input_dir=directory_path)
+        reader = SimpleDirectoryReader(input_dir=directory_path, filename_as_id=filename_as_id)
         return reader.load_data()
\ No newline at end of file
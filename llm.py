@@ -1,7 +1,15 @@
 import os
 import logging
 import os
-from openai import AzureOpenAI
+import asyncio
+import hashlib
+import random
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from openai import AzureOpenAI, AsyncAzureOpenAI, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
 from prompts import BASIC_RAG_PROMPT, ELASTIC_SEARCH_QUERY_GENERATOR_PROMPT
 from dotenv import load_dotenv
 load_dotenv()
@@ -19,61 +27,505 @@ logging.basicConfig(level=logging.INFO,
                     datefmt='%Y-%m-%d %H:%M:%S')
 logger = logging.getLogger(__name__)
 
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+class AsyncRateLimiter:
+    '''
+    Client-side token buckets for requests per minute and tokens per minute.
+    Both buckets refill continuously; acquire() waits until a request and its tokens fit.
+    '''
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens):
+        if self.tokens_per_minute:
+            # A request bigger than the whole budget waits for a full bucket instead of forever
+            tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            async with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return
+            await asyncio.sleep(wait)
+
+    def refund(self, tokens):
+        '''
+        Give back tokens that were reserved but not used.
+        '''
+        if self.tokens_per_minute and tokens > 0:
+            self._tokens = min(self.tokens_per_minute, self._tokens + tokens)
+
+class ResponseCache:
+    '''
+    Two-tier cache of LLM answers.
+    The exact tier is keyed by a hash of (deployment, system prompt, user prompt, context).
+    The optional semantic tier needs an embedder (an EmbeddingModel). Callers embed the question with
+    embed_question (a model forward pass, so async callers run it in a thread) and pass the vector in;
+    the answer of the most similar earlier question asked with the same deployment, system prompt and
+    namespace is returned if the cosine similarity is at least similarity_threshold.
+    The context is left out of the semantic match, since it is retrieved from the question itself;
+    pass the source it is retrieved from (e.g. the index name) as namespace, so answers from another
+    index or corpus are never reused.
+    Both tiers drop entries after ttl seconds and keep at most max_entries, least recently used first.
+    '''
+    def __init__(self, max_entries=1024, ttl=3600, embedder=None, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.stats_counts = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._exact = OrderedDict()
+        self._semantic = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts):
+        parts = [" ".join(unicodedata.normalize("NFC", part or "").split()) for part in parts]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def embed_question(self, question):
+        '''
+        Unit-length question embedding for the semantic tier, or None without an embedder or question.
+        '''
+        if self.embedder is None or not question:
+            return None
+        embedding = np.asarray(self.embedder.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    @staticmethod
+    def _evict(entries, max_entries, now):
+        for key in [key for key, entry in entries.items() if entry[0] <= now]:
+            del entries[key]
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def get_exact(self, deployment, system_prompt, user_prompt, context=""):
+        '''
+        Return the answer cached for exactly this request, or None. A None is not counted as a miss,
+        so callers can check the exact tier before paying for embed_question and then call get.
+        '''
+        now = time.monotonic()
+        key = self.make_key(deployment, system_prompt, user_prompt, context)
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is not None and entry[0] > now:
+                self._exact.move_to_end(key)
+                self.stats_counts["exact_hits"] += 1
+                return entry[1]
+        return None
+
+    def get(self, deployment, system_prompt, user_prompt, context="", question_embedding=None, namespace=""):
+        '''
+        Return the cached answer, or None on a miss.
+        The semantic tier is only consulted when a question_embedding (from embed_question) is given.
+        '''
+        answer = self.get_exact(deployment, system_prompt, user_prompt, context)
+        if answer is not None:
+            return answer
+
+        now = time.monotonic()
+        if question_embedding is not None:
+            scope = self.make_key(deployment, system_prompt, namespace)
+            with self._lock:
+                self._evict(self._semantic, self.max_entries, now)
+                candidates = [(k, entry) for k, entry in self._semantic.items() if entry[1] == scope]
+                if candidates:
+                    similarities = np.stack([entry[2] for _, entry in candidates]) @ question_embedding
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.similarity_threshold:
+                        best_key, best_entry = candidates[best]
+                        self._semantic.move_to_end(best_key)
+                        self.stats_counts["semantic_hits"] += 1
+                        logger.info(f"Semantic cache hit (similarity {similarities[best]:.3f})")
+                        return best_entry[3]
+
+        with self._lock:
+            self.stats_counts["misses"] += 1
+        return None
+
+    def put(self, deployment, system_prompt, user_prompt, answer, context="", question_embedding=None, namespace=""):
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        key = self.make_key(deployment, system_prompt, user_prompt, context)
+        with self._lock:
+            self._exact[key] = (expires_at, answer)
+            self._exact.move_to_end(key)
+            self._evict(self._exact, self.max_entries, now)
+            if question_embedding is not None:
+                scope = self.make_key(deployment, system_prompt, namespace)
+                self._semantic[key] = (expires_at, scope, question_embedding, answer)
+                self._evict(self._semantic, self.max_entries, now)
+
+    def clear(self):
+        with self._lock:
+            self._exact.clear()
+            self._semantic.clear()
+
+    def stats(self):
+        lookups = sum(self.stats_counts.values())
+        hits = self.stats_counts["exact_hits"] + self.stats_counts["semantic_hits"]
+        return {
+            "exact_entries": len(self._exact),
+            "semantic_entries": len(self._semantic),
+            **self.stats_counts,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+class StreamedAnswer:
+    '''
+    Async iterator over the token deltas of a streamed completion.
+    While it is consumed it records time_to_first_token and total_latency (in seconds)
+    and accumulates the full answer in text.
+    '''
+    def __init__(self, deltas):
+        self._deltas = deltas
+        self._parts = []
+        self.time_to_first_token = None
+        self.total_latency = None
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        start = time.perf_counter()
+        async for delta in self._deltas:
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+            self._parts.append(delta)
+            yield delta
+        self.total_latency = time.perf_counter() - start
+        logger.info(f"Streamed answer: first token after {self.time_to_first_token or 0:.2f}s, "
+                    f"complete after {self.total_latency:.2f}s")
+
+    async def collect(self):
+        '''
+        Consume the whole stream and return the answer.
+        '''
+        async for _ in self:
+            pass
+        return self.text.strip()
+
 class LLMProcessor:
-    def __init__(self, api_key=None, model="gpt-4o"):
+    def __init__(self, api_key=None, model="gpt-4o", max_concurrency=8, requests_per_minute=None,
+                 tokens_per_minute=None, max_retries=5, max_tokens=4096, response_cache=None,
+                 max_context_tokens=6000, duplicate_threshold=0.8):
+        '''
+        max_concurrency bounds the number of requests in flight; requests_per_minute and
+        tokens_per_minute throttle on the client before the deployment's quota is hit.
+        Rate-limited, timed out and 5xx requests are retried up to max_retries times
+        with exponential backoff and full jitter (or after Retry-After, when the service sends it).
+        response_cache is an optional ResponseCache; answers found there skip the request entirely.
+        max_context_tokens and duplicate_threshold configure pack_context, which basic_qa applies
+        to a list of retrieved chunks.
+        '''
         self.api_key = api_key or os.getenv("AZURE_OPENAI_KEY_1")
         self.model = model
-        self.client = AzureOpenAI(
+        self.max_retries = max_retries
+        self.max_tokens = max_tokens
+        self.client = AsyncAzureOpenAI(
                             api_key=self.api_key,  
                             api_version="2024-06-01",
-                            azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+                            azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
+                            max_retries=0
                             )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+        self.response_cache = response_cache
+        self.max_context_tokens = max_context_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self._encoding = None
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"LLMProcessor initialized with model: {self.model}")
 
+    def count_tokens(self, text):
+        '''
+        Count tokens with the model's tiktoken encoding, or estimate ~4 characters per token without tiktoken.
+        '''
+        if self._encoding is None:
+            try:
+                import tiktoken
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+            except ImportError:
+                self._encoding = False
+        if self._encoding is False:
+            return len(text) // 4 + 1
+        return len(self._encoding.encode(text))
+
+    def _truncate_tokens(self, text, max_tokens):
+        self.count_tokens("")
+        if self._encoding is False:
+            return text[:(max_tokens - 1) * 4]
+        return self._encoding.decode(self._encoding.encode(text)[:max_tokens])
+
+    @staticmethod
+    def _shingles(text, size=3):
+        words = text.lower().split()
+        return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+    def pack_context(self, chunks, max_context_tokens=None, duplicate_threshold=None, separator="\n\n"):
+        '''
+        Pack retrieved chunks, best first, into a token budget.
+        A chunk is dropped as a near duplicate when at least duplicate_threshold of the word 3-grams of
+        the shorter of it and an already packed chunk appear in the other one (e.g. overlapping windows).
+        Chunks that do not fit the remaining budget are skipped, so smaller, less relevant ones can still fill it;
+        a top chunk larger than the whole budget is truncated rather than dropped.
+        Returns the packed context as one string.
+        '''
+        max_context_tokens = max_context_tokens or self.max_context_tokens
+        duplicate_threshold = duplicate_threshold or self.duplicate_threshold
+        separator_tokens = self.count_tokens(separator)
+        packed, packed_shingles = [], []
+        used_tokens = duplicates = skipped = 0
+        for chunk in chunks:
+            if not chunk or not chunk.strip():
+                continue
+            shingles = self._shingles(chunk)
+            if any(len(shingles & other) >= duplicate_threshold * min(len(shingles), len(other))
+                   for other in packed_shingles):
+                duplicates += 1
+                continue
+            cost = self.count_tokens(chunk) + (separator_tokens if packed else 0)
+            if used_tokens + cost > max_context_tokens:
+                if packed:
+                    skipped += 1
+                    continue
+                chunk = self._truncate_tokens(chunk, max_context_tokens)
+                cost = self.count_tokens(chunk)
+            packed.append(chunk)
+            packed_shingles.append(shingles)
+            used_tokens += cost
+        self.logger.info(f"Packed {len(packed)} chunks into {used_tokens}/{max_context_tokens} tokens "
+                         f"({duplicates} near duplicates, {skipped} over budget)")
+        return separator.join(packed)
+
+    def _backoff_seconds(self, attempt, error):
+        retry_after = getattr(getattr(error, "response", None), "headers", {}).get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        return random.uniform(0, min(60.0, 2 ** attempt))
+
     async def _process_request(self, system_prompt, user_prompt):
         self.logger.info(f"Processing request with model: {self.model}")
-        try:
-            response = self.client.chat.completions.create(
-                model=AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=4096
-            )
-            self.logger.info("Request processed successfully")
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            self.logger.error(f"Error processing request: {str(e)}")
-            raise
+        reserved_tokens = self.count_tokens(system_prompt) + self.count_tokens(user_prompt) + self.max_tokens
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(reserved_tokens)
+            try:
+                async with self.semaphore:
+                    response = await self.client.chat.completions.create(
+                        model=AZURE_OPENAI_DEPLOYMENT_NAME,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        max_tokens=self.max_tokens
+                    )
+                if response.usage is not None:
+                    self.rate_limiter.refund(reserved_tokens - response.usage.total_tokens)
+                self.logger.info("Request processed successfully")
+                return response.choices[0].message.content.strip()
+            except RETRYABLE_ERRORS as e:
+                # The failed request produced no answer; the retry reserves its tokens again
+                self.rate_limiter.refund(reserved_tokens)
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.logger.error(f"Error processing request after {self.max_retries} retries: {str(e)}")
+                    raise
+                backoff = self._backoff_seconds(attempt, e)
+                self.logger.warning(f"Request failed ({type(e).__name__}), retry {attempt} in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+            except Exception as e:
+                self.logger.error(f"Error processing request: {str(e)}")
+                raise
+
+    async def _stream_request(self, system_prompt, user_prompt):
+        '''
+        Same as _process_request, but yields the answer's token deltas as they arrive.
+        Failures are only retried before the first token has been yielded.
+        '''
+        self.logger.info(f"Processing streaming request with model: {self.model}")
+        prompt_tokens = self.count_tokens(system_prompt) + self.count_tokens(user_prompt)
+        reserved_tokens = prompt_tokens + self.max_tokens
+        attempt = 0
+        started = False
+        streamed = []
+        while True:
+            await self.rate_limiter.acquire(reserved_tokens)
+            try:
+                async with self.semaphore:
+                    stream = await self.client.chat.completions.create(
+                        model=AZURE_OPENAI_DEPLOYMENT_NAME,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        max_tokens=self.max_tokens,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            started = True
+                            streamed.append(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                # Streams carry no usage, so count the answer to give back what it did not use
+                self.rate_limiter.refund(reserved_tokens - prompt_tokens - self.count_tokens("".join(streamed)))
+                self.logger.info("Streaming request processed successfully")
+                return
+            except RETRYABLE_ERRORS as e:
+                self.rate_limiter.refund(reserved_tokens - prompt_tokens - self.count_tokens("".join(streamed))
+                                         if started else reserved_tokens)
+                attempt += 1
+                if started or attempt > self.max_retries:
+                    self.logger.error(f"Error processing streaming request: {str(e)}")
+                    raise
+                backoff = self._backoff_seconds(attempt, e)
+                self.logger.warning(f"Streaming request failed ({type(e).__name__}), retry {attempt} in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+            except Exception as e:
+                self.logger.error(f"Error processing streaming request: {str(e)}")
+                raise
+
+    async def _cache_lookup(self, prompt, prompt_template, context, question, namespace):
+        '''
+        Look a request up in the response cache. Returns the cached answer (or None) and the question
+        embedding to store a fresh answer under. The question is only embedded when the exact tier
+        misses, and in a worker thread, so a model forward pass does not block the event loop.
+        '''
+        cached = self.response_cache.get_exact(AZURE_OPENAI_DEPLOYMENT_NAME, prompt_template, prompt, context)
+        if cached is not None:
+            return cached, None
+        question_embedding = await asyncio.to_thread(self.response_cache.embed_question, question)
+        cached = self.response_cache.get(AZURE_OPENAI_DEPLOYMENT_NAME, prompt_template, prompt, context,
+                                         question_embedding, namespace)
+        return cached, question_embedding
 
-    async def _execute_task(self, task_name, prompt, prompt_template):
+    def _execute_task_stream(self, task_name, prompt, prompt_template, context="", question=None, namespace=""):
+        self.logger.info(f"Executing streaming task: {task_name}")
+        if self.response_cache is not None:
+            return StreamedAnswer(self._cached_stream(task_name, prompt, prompt_template, context, question, namespace))
+        return StreamedAnswer(self._stream_request(prompt_template, prompt))
+
+    async def _cached_stream(self, task_name, prompt, prompt_template, context, question, namespace):
+        '''
+        Replay a cached answer as a single delta, or stream a fresh one and cache it once it is complete.
+        '''
+        cached, question_embedding = await self._cache_lookup(prompt, prompt_template, context, question, namespace)
+        if cached is not None:
+            self.logger.info(f"{task_name.capitalize()} answered from cache")
+            yield cached
+            return
+        parts = []
+        async for delta in self._stream_request(prompt_template, prompt):
+            parts.append(delta)
+            yield delta
+        self.response_cache.put(AZURE_OPENAI_DEPLOYMENT_NAME, prompt_template, prompt, "".join(parts).strip(),
+                                context, question_embedding, namespace)
+
+    async def _execute_task(self, task_name, prompt, prompt_template, context="", question=None, namespace=""):
+        '''
+        context, question and namespace only feed the response cache: context is part of the exact key,
+        question is what the semantic tier embeds and namespace scopes the semantic match.
+        '''
         self.logger.info(f"Executing task: {task_name}")
         try:
+            if self.response_cache is not None:
+                cached, question_embedding = await self._cache_lookup(prompt, prompt_template, context, question,
+                                                                      namespace)
+                if cached is not None:
+                    self.logger.info(f"{task_name.capitalize()} answered from cache")
+                    return cached
             result = await self._process_request(prompt_template, prompt)
+            if self.response_cache is not None:
+                self.response_cache.put(AZURE_OPENAI_DEPLOYMENT_NAME, prompt_template, prompt, result, context,
+                                        question_embedding, namespace)
             self.logger.info(f"{task_name.capitalize()} completed successfully")
             return result
         except Exception as e:
             self.logger.error(f"Error in {task_name}: {str(e)}")
             raise
 
-    async def basic_qa(self, context, query):
-        prompt=f'''
+    def _basic_qa_prompt(self, context, query):
+        return f'''
         Context:
         {context}
 
         Query: 
         {query}
         '''
-        return await self._execute_task("RAG answer generation", prompt, BASIC_RAG_PROMPT)
+
+    async def basic_qa(self, context, query, cache_namespace=""):
+        '''
+        context is either a ready string or a list of retrieved chunks in relevance order,
+        which is packed into max_context_tokens with pack_context.
+        cache_namespace names where the context was retrieved from (e.g. the index name); cached answers
+        to similar questions are only reused within the same namespace.
+        '''
+        if not isinstance(context, str):
+            context = self.pack_context(context)
+        prompt=self._basic_qa_prompt(context, query)
+        return await self._execute_task("RAG answer generation", prompt, BASIC_RAG_PROMPT, context, query,
+                                        cache_namespace)
+
+    def basic_qa_stream(self, context, query, cache_namespace=""):
+        '''
+        Streaming basic_qa. Returns a StreamedAnswer: iterate it with `async for` to get token deltas
+        as they arrive; afterwards it holds the full text, time_to_first_token and total_latency.
+        '''
+        if not isinstance(context, str):
+            context = self.pack_context(context)
+        prompt=self._basic_qa_prompt(context, query)
+        return self._execute_task_stream("RAG answer generation", prompt, BASIC_RAG_PROMPT, context, query,
+                                         cache_namespace)
+
+    async def basic_qa_many(self, questions):
+        '''
+        Answer many (context, query) pairs concurrently, within the concurrency and rate limits.
+        Returns the answers in order; a failed question returns its exception instead of an answer.
+        '''
+        return await asyncio.gather(*(self.basic_qa(context, query) for context, query in questions),
+                                    return_exceptions=True)
 
     async def generate_query(self, query):
         prompt=f'''
         User Question:
         {query}
         '''
-        return await self._execute_task("Elastic Search Query Generation", prompt, ELASTIC_SEARCH_QUERY_GENERATOR_PROMPT)
+        return await self._execute_task("Elastic Search Query Generation", prompt, ELASTIC_SEARCH_QUERY_GENERATOR_PROMPT,
+                                        question=query)
 
     # async def extract_entities(self, text, existing_entities=None):
     #     prompt = text
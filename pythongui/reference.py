@@ -1,5 +1,6 @@
 import customtkinter as ctk
 import tkinter as tk
+import asyncio
 import threading
 import time
 from tkinter import messagebox
@@ -161,8 +162,18 @@ class ProgressTextTab(ctk.CTkFrame):
         threading.Thread(target=progress_thread).start()
 
 class ChatWindowTab(ctk.CTkFrame):
-    def __init__(self, parent):
+    def __init__(self, parent, answer_stream=None):
+        # answer_stream: optional callable taking the user's message and returning an async iterator
+        # of answer deltas, e.g. lambda message: llm.basic_qa_stream(context, message).
+        # Without it, a canned reply is streamed.
         super().__init__(parent)
+        self.answer_stream = answer_stream
+        self.answer_lock = None
+        if answer_stream is not None:
+            # One long-lived loop for every message: the LLM client, semaphore and rate limiter
+            # behind answer_stream are bound to the loop they are first used on
+            self.loop = asyncio.new_event_loop()
+            threading.Thread(target=self.loop.run_forever, daemon=True).start()
         self.create_widgets()
 
     def create_widgets(self):
@@ -185,7 +196,10 @@ class ChatWindowTab(ctk.CTkFrame):
         if user_message:
             self.display_message("You", user_message)
             self.chat_input.delete(0, tk.END)
-            threading.Thread(target=self.stream_response).start()
+            if self.answer_stream is not None:
+                asyncio.run_coroutine_threadsafe(self.consume_answer_stream(user_message), self.loop)
+            else:
+                threading.Thread(target=self.stream_response).start()
 
     def stream_response(self):
         response = "Thank you for your message. This is a streamed response."
@@ -205,6 +219,28 @@ class ChatWindowTab(ctk.CTkFrame):
         self.chat_display.insert(tk.END, "\n\n")
         self.chat_display.configure(state="disabled")
 
+    async def consume_answer_stream(self, user_message):
+        # Runs on self.loop; the lock keeps answers to quick successive messages from interleaving
+        if self.answer_lock is None:
+            self.answer_lock = asyncio.Lock()
+        async with self.answer_lock:
+            self.append_text("Bot: ")
+            try:
+                async for delta in self.answer_stream(user_message):
+                    self.append_text(delta)
+            except Exception as e:
+                self.append_text(f"[Error: {e}]")
+            self.append_text("\n\n")
+
+    def append_text(self, text):
+        # Called from the streaming thread; Tk widgets must be updated on the main loop
+        def insert():
+            self.chat_display.configure(state="normal")
+            self.chat_display.insert(tk.END, text)
+            self.chat_display.see(tk.END)
+            self.chat_display.configure(state="disabled")
+        self.after(0, insert)
+
     def display_message(self, sender, message):
         self.chat_display.configure(state="normal")
         self.chat_display.insert(tk.END, f"{sender}: {message}\n\n")
@@ -18,6 +18,7 @@ parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, parent_dir)
 from elastic_helpers import ESBulkIndexer, ESQueryMaker
 from elastic_config import BASIC_CONFIG
+from ingest_checkpoint import IngestCheckpoint
 sys.path.pop(0)
 
 # Initialize Elasticsearch
@@ -31,34 +32,81 @@ es_query_maker = ESQueryMaker(cloud_id=ELASTIC_CLOUD_ID, credentials=ELASTIC_CLO
 def generate_unique_id():
     return str(uuid.uuid4())
 
-def main(csv_path, batch_size):
-    # Load Data
-    csv = pd.read_csv(csv_path)
+def row_unique_id(csv_path, row_number):
+    '''
+    ID derived from the file and row, so a resumed run upserts the same documents instead of duplicating them.
+    '''
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{os.path.abspath(csv_path)}#{row_number}"))
 
-    csv_dict = csv.to_dict()
+def iter_csv_documents(csv_path, chunksize=50000, skip_rows=0, stable_ids=False):
+    '''
+    Stream the CSV as documents, chunksize rows at a time, so memory stays flat however big the file is.
+    Each row becomes a dict with a "uid" first (random, or row-derived with stable_ids);
+    missing values become None (null) rather than NaN. The first skip_rows data rows are skipped.
+    '''
+    row_number = skip_rows
+    # A callable, not range(): pandas turns a list-like skiprows into a set of every skipped row
+    for frame in pd.read_csv(csv_path, chunksize=chunksize, skiprows=lambda i: 0 < i <= skip_rows):
+        frame = frame.astype(object).where(frame.notna(), None)
+        if stable_ids:
+            uids = [row_unique_id(csv_path, row_number + i) for i in range(len(frame))]
+        else:
+            uids = [generate_unique_id() for _ in range(len(frame))]
+        frame.insert(0, "uid", uids)
+        row_number += len(frame)
+        yield from frame.to_dict('records')
 
-    cols = ["uid"] + list(csv_dict.keys())
-    count = len(csv_dict[cols[1]])
-    docs = []
-    for i in range(count):
-        unique_id = generate_unique_id()
-        obj = dict(zip(cols, [unique_id] + [csv_dict[j][i] for j in cols[1:]]))
-        docs += [obj]
+def iter_csv_documents_arrow(csv_path, block_size=64 * 1024 * 1024, skip_rows=0, stable_ids=False):
+    '''
+    Same as iter_csv_documents, but parsed by pyarrow's multithreaded streaming CSV reader, block_size bytes at a time.
+    '''
+    from pyarrow import csv as pa_csv
 
-    # Upload
+    read_options = pa_csv.ReadOptions(block_size=block_size, skip_rows_after_names=skip_rows)
+    row_number = skip_rows
+    for batch in pa_csv.open_csv(csv_path, read_options=read_options):
+        for row in batch.to_pylist():
+            uid = row_unique_id(csv_path, row_number) if stable_ids else generate_unique_id()
+            row_number += 1
+            yield {"uid": uid, **row}
+
+def main(csv_path, batch_size, chunksize=50000, engine="pandas", num_workers=4, checkpoint_path=None):
     index_name = "blog_authorship"
     index_exists = es_bulk_indexer.check_index_existence(index_name=index_name)
     if not index_exists:
         es_bulk_indexer.create_es_index(es_configuration=BASIC_CONFIG, index_name=index_name)
 
-    success_count = es_bulk_indexer.bulk_upload_documents(
-        index_name=index_name, 
-        documents=docs, 
-        id_col='uid',
-        batch_size=batch_size
-    )
+    # Resume from the last committed row, if checkpointing; a new index has nothing committed yet
+    checkpoint = IngestCheckpoint(checkpoint_path, track_ids=False) if checkpoint_path else None
+    if checkpoint and not index_exists:
+        checkpoint.clear()
+    skip_rows = checkpoint.committed_offset if checkpoint else 0
+    if skip_rows:
+        print(f"Resuming after {skip_rows} committed rows.")
+
+    # Stream Data
+    if engine == "pyarrow":
+        docs = iter_csv_documents_arrow(csv_path, skip_rows=skip_rows, stable_ids=checkpoint is not None)
+    else:
+        docs = iter_csv_documents(csv_path, chunksize=chunksize, skip_rows=skip_rows, stable_ids=checkpoint is not None)
+
+    # Upload
+    with es_bulk_indexer.bulk_load(index_name):
+        results = es_bulk_indexer.stream_bulk_upload_documents(
+            index_name=index_name, 
+            documents=docs, 
+            id_col='uid',
+            batch_size=batch_size,
+            num_workers=num_workers,
+            on_batch_done=checkpoint.record_batch if checkpoint else None
+        )
     
-    print(f"Successfully uploaded {success_count} documents.")
+    print(f"Successfully uploaded {results['total_success']} documents.")
+    if results['total_failed']:
+        print(f"Failed to upload {results['total_failed']} documents.")
+    elif checkpoint:
+        # Nothing left to resume
+        checkpoint.clear()
 
 if __name__ == "__main__":
     '''
@@ -67,6 +115,12 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Ingest CSV file and upload to Elastic Cloud")
     parser.add_argument("csv_path", type=str, help="Path to the CSV file to be ingested")
     parser.add_argument("batch_size", type=int, help="Batch size of upload")
+    parser.add_argument("--chunksize", type=int, default=50000, help="Rows read from the CSV at a time")
+    parser.add_argument("--engine", choices=["pandas", "pyarrow"], default="pandas", help="CSV parser to stream with")
+    parser.add_argument("--workers", type=int, default=4, help="Number of bulk requests in flight at once")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                        help="State file recording committed rows; an interrupted run given the same file resumes from it")
     args = parser.parse_args()
     
-    main(args.csv_path, args.batch_size)
\ No newline at end of file
+    main(args.csv_path, args.batch_size, chunksize=args.chunksize, engine=args.engine, num_workers=args.workers,
+         checkpoint_path=args.checkpoint)
\ No newline at end of file